@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks of the game engine.
+
+Usage: python benchmark.py
+"""
+
+import random
+import time
+
+import main
+
+
+def make_orders(map_size, nb_orders, seed=0):
+    """Returns a line of random orders on a map of the given size
+    Parameters:
+    ----------
+    map_size: number of rows and columns of the map (list)
+    nb_orders: number of orders in the line (int)
+    seed: seed of the random orders (int, optional)
+
+    Return:
+    ------
+    orders: the orders separated by spaces (str)
+    """
+    rng = random.Random(seed)
+    list_order = []
+    for order in range(nb_orders):
+        row = rng.randint(1, map_size[0])
+        col = rng.randint(1, map_size[1])
+        symbol = rng.choice(["@", "*", "<", "pacify"])
+        if symbol == "pacify":
+            list_order.append("%d-%d:pacify" % (row, col))
+        else:
+            list_order.append("%d-%d:%s%d-%d" % (row, col, symbol, row + rng.randint(-1, 1), col + rng.randint(-1, 1)))
+    return " ".join(list_order)
+
+
+def benchmark_orders(map_path='file.ano', nb_orders=100000, repeat=5):
+    """Measures how fast a line of orders is parsed and filtered by team
+    Parameters:
+    ----------
+    map_path: path of map file (str, optional)
+    nb_orders: number of orders in the line (int, optional)
+    repeat: number of measures, the best one is kept (int, optional)
+    """
+    data = main.extract_ano_file(map_path)
+    orders = make_orders(data["map"], nb_orders)
+    best = None
+    for measure in range(repeat):
+        start = time.perf_counter()
+        main.check_if_good_team(data, main.parse_orders(orders), 1)
+        duration = time.perf_counter() - start
+        if best is None or duration < best:
+            best = duration
+    print("orders: %d orders parsed and filtered in %.3f s (%.0f orders/s)" % (nb_orders, best, nb_orders / best))
+
+
+def benchmark_wire(map_size=(100, 100), nb_orders=100000, repeat=5):
+    """Compares the size and the encoding and decoding time of the text and binary formats of the orders
+    Parameters:
+    ----------
+    map_size: number of rows and columns of the map (list, optional)
+    nb_orders: number of orders sent (int, optional)
+    repeat: number of measures, the best one is kept (int, optional)
+    """
+    list_order = main.parse_orders(make_orders(map_size, nb_orders))
+    for wire_format in main.WIRE_FORMATS:
+        connection = {'format': wire_format}
+        best_encode = best_decode = None
+        for measure in range(repeat):
+            main.parsed_orders.clear()
+            start = time.perf_counter()
+            payload = main.encode_orders(connection, list_order)
+            middle = time.perf_counter()
+            orders = main.decode_orders(payload)
+            if isinstance(orders, str):
+                orders = main.parse_orders(orders)
+            end = time.perf_counter()
+            if best_encode is None or middle - start < best_encode:
+                best_encode = middle - start
+            if best_decode is None or end - middle < best_decode:
+                best_decode = end - middle
+        assert orders == list_order
+        print("wire %s: %d orders in %d bytes (%.1f bytes/order), encoded in %.3f s, decoded in %.3f s" % (
+            wire_format, nb_orders, len(payload), len(payload) / nb_orders, best_encode, best_decode))
+
+
+def benchmark_games(map_path='file.ano', nb_games=20):
+    """Measures how fast AI vs AI games are played without display
+    Parameters:
+    ----------
+    map_path: path of map file (str, optional)
+    nb_games: number of games (int, optional)
+    """
+    nb_rounds = 0
+    start = time.perf_counter()
+    for seed in range(nb_games):
+        nb_rounds += main.run_game(map_path, 1, 'AI', 2, 'AI', seed=seed)["nb_round"]
+    duration = time.perf_counter() - start
+    print("games: %d games (%d rounds) in %.3f s (%.0f rounds/s)" % (nb_games, nb_rounds, duration,
+                                                                    nb_rounds / duration))
+
+
+def benchmark_mcts(map_path='file.ano', nb_rounds=20, budget=0.05, nb_workers=None):
+    """Measures how many rollouts per second the 'MCTS' player runs during a game against the AI
+    Parameters:
+    ----------
+    map_path: path of map file (str, optional)
+    nb_rounds: maximum number of rounds played (int, optional)
+    budget: time of the search of each round in seconds (float, optional)
+    nb_workers: number of processes of the search, all the cores by default (int, optional)
+    """
+    game = main.start_game(map_path, seed=0)
+    try:
+        while not game["game_over"] and game["nb_round"] < nb_rounds:
+            main.begin_round(game)
+            if not game["game_over"]:
+                main.play_round(game, main.get_MCTS_orders(game, 1, budget, nb_workers),
+                                main.get_player_orders(game, 2, 'AI'))
+    finally:
+        if "mcts_executor" in game:
+            game.pop("mcts_executor").shutdown()
+    stats = game["mcts_stats"][1]
+    print("mcts: %d rollouts in %.3f s (%.0f rollouts/s)" % (stats["rollouts"], stats["time"],
+                                                           stats["rollouts"] / stats["time"]))
+
+
+if __name__ == '__main__':
+    benchmark_orders()
+    benchmark_wire()
+    benchmark_games()
+    benchmark_mcts()
@@ -1,12 +1,95 @@
 # -*- coding: utf-8 -*-
 
+import asyncio
 import blessed
+import math
+import mmap
+import os
 import random
 import time
+import re
 import socket
+import struct
+import sys
+from array import array
+from collections import OrderedDict, namedtuple
+from collections.abc import Mapping, MutableMapping
+from concurrent.futures import ProcessPoolExecutor
+from itertools import compress
 
 term = blessed.Terminal()
 
+# bonus given to the werewolves of the same team: (bonus, maximum distance)
+BONUS_RULES = {"normal": (10, 2), "alpha": (30, 4)}
+
+# an order of a player: kind is 'pacify', 'fight', 'feed' or 'move', src and dst are (row, column)
+# (dst is None for 'pacify')
+Order = namedtuple("Order", ("kind", "src", "dst"))
+ORDER_KINDS = {"@": "move", "*": "fight", "<": "feed"}
+# the orders of a round are executed phase by phase in this order
+ORDER_PHASES = ("pacify", "fight", "feed", "move")
+parsed_orders = {}
+ORDER_PATTERN = re.compile(r"(?<!\S)(\d+)-(\d+):(?:([@*<])(\d+)-(\d+)|pacify)(?!\S)")
+
+# escape sequences computed for each terminal (see get_palette)
+palettes = {}
+
+# size of the squares of cells used to group the foods (see build_occupancy)
+FOOD_BUCKET_SIZE = 8
+
+# moves leading to the cells at a given distance or less (see get_neighbourhood)
+neighbourhoods = {}
+
+# cells next to each cell of a map, by size of map (see get_adjacency)
+adjacencies = {}
+
+# maximum number of distance fields kept at the same time (see get_distance_field)
+MAX_DISTANCE_FIELDS = 16
+
+# header of the frames sent on a connection: size of the payload in bytes (see send_frame)
+FRAME_HEADER = struct.Struct("!I")
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+# formats of the orders on a connection, by order of preference (see negotiate_format)
+WIRE_FORMATS = ("binary", "text")
+# binary orders: a NUL byte then one record per order (opcode, row, column, destination row and column)
+ORDER_RECORD = struct.Struct("!BHHHH")
+ORDER_OPCODE_KINDS = ("pacify", "fight", "feed", "move")
+ORDER_OPCODES = {kind: opcode for opcode, kind in enumerate(ORDER_OPCODE_KINDS)}
+ORDER_SYMBOLS = {"move": "@", "fight": "*", "feed": "<"}
+
+# binary snapshot of a game (see dump_snapshot): magic, byte order of the columns, game over, version of the
+# random generator, map size, round counters, winner, seed, number of werewolves and foods, and size of the
+# bonus grid, of the werewolves whose bonus is out of date and of the werewolves which fell to 0
+SNAPSHOT_MAGIC = b"WOLFSNP1"
+SNAPSHOT_HEADER = struct.Struct("<8s??Bxiiiiiq5I4x")
+# gauss_next of the random generator (whether it is set and its value), followed by its 625 words
+SNAPSHOT_RNG = struct.Struct("<?7xd")
+
+# parsed maps by (path, modification time, size), the most recently used last (see load_map)
+map_cache = OrderedDict()
+MAP_CACHE_SIZE = 8
+# disk cache of a map: modification time and size of the file.ano, then a snapshot of its data
+MAP_CACHE_SUFFIX = ".cache"
+MAP_CACHE_HEADER = struct.Struct("<qq")
+
+# value recorded in the undo journal for a key which was not in a dictionary (see journal_item)
+JOURNAL_MISSING = object()
+
+# Monte Carlo tree search player (see get_MCTS_orders): time of the search of each round in seconds, number of
+# processes (None for all the cores), candidates at each node, depth of the tree and of the rollouts, and
+# weight of the exploration in UCB1
+MCTS_TIME_BUDGET = 0.05
+MCTS_WORKERS = None
+MCTS_NB_CANDIDATES = 6
+MCTS_MAX_DEPTH = 3
+MCTS_ROLLOUT_DEPTH = 3
+MCTS_EXPLORATION = 0.7
+
+# letters used to show the objects on the map
+WEREWOLF_LETTERS = {"alpha": "A", "omega": "O", "normal": "W", "human": "H"}
+FOOD_LETTERS = {"berries": "b", "apples": "a", "mice": "m", "rabbits": "r", "deers": "d"}
+
 
 # other functions
 
@@ -42,7 +125,32 @@ def create_server_socket(local_port, verbose):
     return socket_in
 
 
-def create_client_socket(remote_IP, remote_port, verbose):
+def get_backoff_delay(attempt, initial_delay=.1, max_delay=2., rng=random):
+    """Returns the time to wait before trying to connect again.
+
+    Parameters
+    ----------
+    attempt: number of failed attempts so far, from 1 (int)
+    initial_delay: maximum delay after the first failed attempt in seconds (float, optional)
+    max_delay: maximum delay in seconds (float, optional)
+    rng: random generator, the random module by default (random.Random, optional)
+
+    Returns
+    -------
+    delay: delay in seconds (float)
+
+    Notes
+    -----
+    The maximum delay doubles after each failed attempt and the delay is drawn between 0 and this
+    maximum, so that many clients started at the same time do not all try again at the same time.
+
+    """
+
+    return rng.uniform(0, min(max_delay, initial_delay * 2 ** (attempt - 1)))
+
+
+def create_client_socket(remote_IP, remote_port, verbose, timeout=None, initial_delay=.1, max_delay=2.,
+                         metrics=None):
     """Creates a client socket.
 
     Parameters
@@ -50,35 +158,62 @@ def create_client_socket(remote_IP, remote_port, verbose):
     remote_IP: IP address to send to (int)
     remote_port: port to send to (int)
     verbose: True if verbose (bool)
+    timeout: maximum time to try to connect in seconds, None to try forever (float, optional)
+    initial_delay: maximum delay after the first failed attempt in seconds (float, optional)
+    max_delay: maximum delay between two attempts in seconds (float, optional)
+    metrics: dictionary where the number of attempts and the time to connect are stored (dict, optional)
 
     Returns
     -------
     socket_out: client socket (socket.socket)
 
-    """
+    Raises
+    ------
+    IOError: if the connection is not made before the timeout
+
+    Notes
+    -----
+    The delay between two attempts grows exponentially with random jitter (see get_backoff_delay).
+    Nagle's algorithm is disabled (TCP_NODELAY) as orders are small packets waiting for an answer.
 
-    socket_out = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    socket_out.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)  # deal with a socket in TIME_WAIT state
+    """
 
-    connected = False
-    msg_shown = False
+    start = time.perf_counter()
+    deadline = None if timeout is None else start + timeout
+    attempt = 0
 
-    while not connected:
+    if verbose:
+        print(' connecting on %s:%d to send orders' % (remote_IP, remote_port))
+
+    while True:
+        attempt += 1
+        socket_out = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        socket_out.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)  # deal with a socket in TIME_WAIT state
+        if deadline is not None:
+            socket_out.settimeout(max(deadline - time.perf_counter(), .01))
         try:
-            if verbose and not msg_shown:
-                print(' connecting on %s:%d to send orders' % (remote_IP, remote_port))
-
             socket_out.connect((remote_IP, remote_port))
-            connected = True
+            break
+        except OSError:
+            socket_out.close()
+            delay = get_backoff_delay(attempt, initial_delay, max_delay)
+            if deadline is not None:
+                if time.perf_counter() >= deadline:
+                    raise IOError('%s:%d cannot be reached after %d attempts' % (remote_IP, remote_port, attempt))
+                delay = min(delay, deadline - time.perf_counter())
+            if verbose and attempt == 1:
+                print('   connection failed -> will try again with increasing delays...')
+            time.sleep(delay)
+
+    socket_out.settimeout(None)
+    socket_out.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    if metrics is not None:
+        metrics['connect_attempts'] = attempt
+        metrics['connect_time'] = time.perf_counter() - start
 
-            if verbose:
-                print('   done -> can now send orders to %s:%d\n' % (remote_IP, remote_port))
-        except:
-            if verbose and not msg_shown:
-                print('   connection failed -> will try again every 100 msec...')
-
-            time.sleep(.1)
-            msg_shown = True
+    if verbose:
+        print('   done -> can now send orders to %s:%d\n' % (remote_IP, remote_port))
 
     return socket_out
 
@@ -101,6 +236,7 @@ def wait_for_connection(socket_in, verbose):
         print(' waiting for a remote connection to receive orders')
 
     socket_in, remote_address = socket_in.accept()
+    socket_in.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
 
     if verbose:
         print('   done -> can now receive remote orders from %s:%d\n' % remote_address)
@@ -108,7 +244,7 @@ def wait_for_connection(socket_in, verbose):
     return socket_in
 
 
-def create_connection(your_group, other_group=0, other_IP='127.0.0.1', verbose=False):
+def create_connection(your_group, other_group=0, other_IP='127.0.0.1', verbose=False, timeout=None, formats=None):
     """Creates a connection with a referee or another group.
 
     Parameters
@@ -117,6 +253,8 @@ def create_connection(your_group, other_group=0, other_IP='127.0.0.1', verbose=F
     other_group: id of the other group, if there is no referee (int, optional)
     other_IP: IP address where the referee or the other group is (str, optional)
     verbose: True only if connection progress must be displayed (bool, optional)
+    timeout: maximum time to connect to the referee or the other group in seconds (float, optional)
+    formats: formats of orders to negotiate with the other side, None to send text (tuple of str, optional)
 
     Returns
     -------
@@ -137,8 +275,15 @@ def create_connection(your_group, other_group=0, other_IP='127.0.0.1', verbose=F
 
     The returned connection can be used directly with other functions in this module.
 
+    With a referee, formats can only be negotiated if the referee is referee.py.
+
+    connection['metrics'] holds the number of attempts and the time needed to connect, and the number
+    of orders received and the total time spent waiting for them (see get_remote_orders).
+
     """
 
+    metrics = {'nb_received': 0, 'receive_time': 0.}
+
     # init verbose display
     if verbose:
         print('\n[--- starts connection -----------------------------------------------------\n')
@@ -149,9 +294,9 @@ def create_connection(your_group, other_group=0, other_IP='127.0.0.1', verbose=F
             print('** group %d connecting to referee on %s **\n' % (your_group, other_IP))
 
         # create one socket (client only)
-        socket_out = create_client_socket(other_IP, 42000 + your_group, verbose)
+        socket_out = create_client_socket(other_IP, 42000 + your_group, verbose, timeout, metrics=metrics)
 
-        connection = {'in': socket_out, 'out': socket_out}
+        connection = {'in': socket_out, 'out': socket_out, 'metrics': metrics}
 
         if verbose:
             print('** group %d successfully connected to referee on %s **\n' % (your_group, other_IP))
@@ -161,15 +306,21 @@ def create_connection(your_group, other_group=0, other_IP='127.0.0.1', verbose=F
 
         # create two sockets (server and client)
         socket_in = create_server_socket(42000 + your_group, verbose)
-        socket_out = create_client_socket(other_IP, 42000 + other_group, verbose)
+        socket_out = create_client_socket(other_IP, 42000 + other_group, verbose, timeout, metrics=metrics)
 
         socket_in = wait_for_connection(socket_in, verbose)
 
-        connection = {'in': socket_in, 'out': socket_out}
+        connection = {'in': socket_in, 'out': socket_out, 'metrics': metrics}
 
         if verbose:
             print('** group %d successfully connected to group %d on %s **\n' % (your_group, other_group, other_IP))
 
+    # agree on the format of the orders
+    if formats is not None:
+        negotiate_format(connection, formats, other_group == 0)
+        if verbose:
+            print('** orders sent in %s **\n' % connection['format'])
+
     # end verbose display
     if verbose:
         print('----------------------------------------------------- connection started ---]\n')
@@ -257,375 +408,1569 @@ def close_connection(connection):
     socket_out.close()
 
 
-def notify_remote_orders(connection, orders):
-    """Notifies orders to a remote player.
+def send_frame(socket_out, payload):
+    """Sends a payload prefixed by its size.
+
+    Parameters
+    ----------
+    socket_out: socket to send to (socket.socket)
+    payload: bytes to send (bytes)
+
+    """
+
+    socket_out.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+
+
+def read_frame(connection):
+    """Returns the payload of the next frame received on a connection.
 
     Parameters
     ----------
     connection: sockets to receive/send orders (dict of socket.socket)
-    orders: orders to notify (str)
+
+    Returns
+    -------
+    payload: bytes of the frame (bytes)
 
     Raises
     ------
-    IOError: if remote player cannot be reached
+    IOError: if the connection is closed or the frame is too large
+
+    Notes
+    -----
+    The bytes received are kept in connection['buffer']: a frame may arrive in several parts,
+    and the frames received after the current one are given back by the next calls.
 
     """
 
-    # deal with null orders (empty string)
-    if orders == '':
-        orders = 'null'
+    buffer = connection.setdefault('buffer', bytearray())
+    size = None
+    while True:
+        if size is None and len(buffer) >= FRAME_HEADER.size:
+            size = FRAME_HEADER.unpack_from(buffer)[0]
+            if size > MAX_FRAME_SIZE:
+                raise IOError('frame of %d bytes is too large' % size)
+        if size is not None and len(buffer) >= FRAME_HEADER.size + size:
+            payload = bytes(buffer[FRAME_HEADER.size:FRAME_HEADER.size + size])
+            del buffer[:FRAME_HEADER.size + size]
+            return payload
 
-    # send orders
-    try:
-        connection['out'].sendall(orders.encode())
-    except:
-        raise IOError('remote player cannot be reached')
+        chunk = connection['in'].recv(65536)
+        if chunk == b'':
+            raise IOError('connection closed by remote player')
+        buffer += chunk
 
 
-def get_remote_orders(connection):
-    """Returns orders from a remote player.
+def negotiate_format(connection, formats=WIRE_FORMATS, referee=False):
+    """Agrees with a remote player on the format of the orders sent on a connection.
 
     Parameters
     ----------
     connection: sockets to receive/send orders (dict of socket.socket)
+    formats: formats supported, by order of preference (tuple of str, optional)
+    referee: True if the connection is with a referee, False if it is with another group (bool, optional)
 
     Returns
-    ----------
-    player_orders: orders given by remote player (str)
+    -------
+    format: the first of your formats also supported by the remote player, 'text' if there is none (str)
 
     Raises
     ------
     IOError: if remote player cannot be reached
 
+    Notes
+    -----
+    Negotiate right after connecting.  The format is kept in connection['format']; orders are read in
+    whatever format they come in, so a player sending text is always understood.
+
+    A group which does not negotiate sends orders instead of an answer: the format is then 'text', the
+    orders are kept in connection['pending'] (given by the next get_remote_orders) and
+    connection['negotiation_played'] is set, since that group took the negotiation for the first orders of
+    your team (run_game then plays them empty, without sending them).
+
+    The referee must be referee.py, which answers while relaying the first orders: the orders relayed
+    before its answer are kept in connection['pending'].
+
     """
 
-    # receive orders
+    connection['format'] = 'text'
     try:
-        orders = connection['in'].recv(65536).decode()
+        send_frame(connection['out'], ('formats:' + ','.join(formats)).encode())
+        answer = read_frame(connection)
+        while not answer.startswith(b'formats:'):
+            connection.setdefault('pending', []).append(answer)
+            if not referee:
+                connection['negotiation_played'] = True
+                return connection['format']
+            answer = read_frame(connection)
     except:
         raise IOError('remote player cannot be reached')
 
-    # deal with null orders
-    if orders == 'null':
-        orders = ''
+    remote_formats = answer[len('formats:'):].decode().split(',')
+    for wire_format in formats:
+        if wire_format in remote_formats:
+            connection['format'] = wire_format
+            break
+    return connection['format']
 
-    return orders
 
+def encode_orders(connection, orders):
+    """Returns the payload of a frame of orders in the format of a connection.
 
-def extract_ano_file(ano_file):
-    """Extract all information from the file.ano
-    Parameters :
-    -----------
-    anoFile : the path of the file.ano (str)
+    Parameters
+    ----------
+    connection: sockets to receive/send orders (dict)
+    orders: orders to encode (str or list of Order)
 
-    Return :
-    ---------
-    data : dictionary with all information (dictionary)
+    Returns
+    -------
+    payload: the encoded orders (bytes)
+
+    Notes
+    -----
+    Orders whose coordinates do not fit in a binary record (more than 65535) are sent as text, which
+    the remote player reads as well (see decode_orders).
 
-    Version :
-    -----------
-    specification: Elie Goche (v.1 19/02/2022)
-    implementation: Elie Goche, Younes Kouza, Youssef Fiher, Omar Ametjaou (v.1 25/02/2022)
     """
-    data = {}
-    list_ano_file = []
-    list_element_list = []
-    file = open(ano_file, "r+")
-    for line in file.readlines():
-        string = line
-        characters = "\n"
-        for x in range(len(characters)):
-            string = string.replace(characters[x], "")
-            list_ano_file.append(string)
-    list_ano_file.remove("map:")
-    list_ano_file.remove("werewolves:")
-    list_ano_file.remove("foods:")
-    for elem in list_ano_file:
-        list_elem = elem.split(" ")
-        list_element_list.append(list_elem)
-
-    list_foods = []
-    data_foods = {}
-    list_werewolves = []
-    data_werewolves = {}
-    list_map = []
-
-    for info in list_element_list:
-        if len(info) == 2:
-            list_map.append(info)
-        if len(info) == 4:
-            if info[3] in ["omega", "alpha", "normal"]:
-                list_werewolves.append(info)
-            elif info[2] in ["berries", "apples", "mice", "rabbits", "deers"]:
-                list_foods.append(info)
-
-    id_werewolves = 0
-    id_foods = 0
-
-    for list in list_werewolves:
-        id_werewolves += 1
-        data_werewolves["w" + str(id_werewolves)] = {"location": [int(list[1]), int(list[2])],
-                                                     "type": list[3],
-                                                     "type_ref": list[3],
-                                                     "team": int(list[0]),
-                                                     "previous_energy": 100,
-                                                     "energy": 100,
-                                                     "bonus": 0,
-                                                     "pacified": False,
-                                                     "nb_action": 0}
-
-    for list in list_foods:
-        id_foods += 1
-        data_foods["f" + str(id_foods)] = {"location": [int(list[0]), int(list[1])],
-                                           "type": list[2],
-                                           "energy": int(list[3])}
-
-    for list in list_map:
-        data["map"] = [int(list[0]), int(list[1])]
 
-    data["werewolves"] = data_werewolves
-    data["foods"] = data_foods
+    if connection.get('format', 'text') == 'binary':
+        if isinstance(orders, str):
+            orders = parse_orders(orders)
+        try:
+            return pack_orders(orders)
+        except struct.error:
+            pass
 
-    return data
+    if not isinstance(orders, str):
+        orders = format_orders(orders)
+    # deal with null orders (empty string)
+    if orders == '':
+        orders = 'null'
+    return orders.encode()
 
 
-def create_empty_map(map_size):
-    """This function returns a dictionary with all information for each line in the map
-    Parameters :
+def decode_orders(payload):
+    """Returns the orders of a frame, whatever its format.
+
+    Parameters
     ----------
-    map_location : the size of the map (list)
+    payload: the encoded orders (bytes)
 
-    Return :
-    ------
-    data_map : dictionary with all information for each line in the map
+    Returns
+    -------
+    orders: the orders, as a line for text frames and as a list for binary frames (str or list of Order)
 
-    Version :
-    -----------
-    specification: Elie Goche (v.1 19/02/2022)
-    implementation: Elie Goche, Younes Kouza (v.1 25/02/2022)
     """
-    data_map = {}
-    list = []
-    for line in range(map_size[0] * 2 + 1):
-        if line % 2 != 1:
-            for rang in range(map_size[1] * 2 + 1):
-                if rang % 2 != 1:
-                    list.append("+")
-                else:
-                    list.append("--")
-                data_map["l" + str(line)] = list
-            list = []
-        else:
-            for rang in range(map_size[1] * 2 + 1):
-                if rang % 2 != 1:
-                    list.append("|")
-                else:
-                    list.append("  ")
-                data_map["l" + str(line)] = list
-            list = []
-    return data_map
 
+    if payload[:1] == b'\x00':
+        return unpack_orders(payload)
 
-def place_werewolves(data, data_map, id, team, letter):
-    """This function adds to the data_map the location of all werewolves in each line with their type and energy level
-    Parameters:
+    orders = payload.decode()
+    # deal with null orders
+    if orders == 'null':
+        orders = ''
+    return orders
+
+
+def notify_remote_orders(connection, orders):
+    """Notifies orders to a remote player.
+
+    Parameters
     ----------
-    data: dictionary of all information from the file.ano (dict)
-    data_map: dictionary with all information for each line in the map (dict)
-    id: the id of the werewolve (str)
-    team: the team of the werewolve (int)
-    letter: the type of the werewolve (A=alpha, O=omega, W=werewolve, H=humain) (str)
+    connection: sockets to receive/send orders (dict of socket.socket)
+    orders: orders to notify (str or list of Order)
 
-    Return:
+    Raises
     ------
-    data_map: dictionary with all information for each line in the map (dict)
+    IOError: if remote player cannot be reached
+
+    Notes
+    -----
+    Orders are sent in the format agreed with the remote player (see negotiate_format), text by default.
 
-    Version :
-    -----------
-    specification: Youssef Fiher, Omar Ametjaou (v.1 25/03/2022)
-    implementation: Elie Goche(v.1 05/03/2022)
     """
-    if team == 1:
-        if letter == "A":
-            data_map["l" + str((data["werewolves"][id]["location"][0]) * 2 - 1)][
-                (data["werewolves"][id]["location"][1]) * 2 - 1] = term.lightblue1(letter) + get_color_energy(data, id)
-        else:
-            if data['werewolves'][id]["energy"] <= 0:
-                data['werewolves'][id]["energy"] = 0
-                data['werewolves'][id]["type"] = "human"
-                data_map["l" + str((data["werewolves"][id]["location"][0]) * 2 - 1)][
-                    (data["werewolves"][id]["location"][1]) * 2 - 1] = term.lightblue1("H ")
 
-            else:
-                data_map["l" + str((data["werewolves"][id]["location"][0]) * 2 - 1)][
-                    (data["werewolves"][id]["location"][1]) * 2 - 1] = term.lightblue1(letter) + get_color_energy(data,
-                                                                                                                  id)
-    else:
-        if letter == "A":
-            data_map["l" + str((data["werewolves"][id]["location"][0]) * 2 - 1)][
-                (data["werewolves"][id]["location"][1]) * 2 - 1] = term.orangered(letter) + get_color_energy(data, id)
-        else:
-            if data['werewolves'][id]["energy"] <= 0:
-                data['werewolves'][id]["energy"] = 0
-                data['werewolves'][id]["type"] = "human"
-                data_map["l" + str((data["werewolves"][id]["location"][0]) * 2 - 1)][
-                    (data["werewolves"][id]["location"][1]) * 2 - 1] = term.orangered("H ")
-            else:
-                data_map["l" + str((data["werewolves"][id]["location"][0]) * 2 - 1)][
-                    (data["werewolves"][id]["location"][1]) * 2 - 1] = term.orangered(letter) + get_color_energy(data,
-                                                                                                                 id)
-    return data_map
+    # send orders
+    try:
+        send_frame(connection['out'], encode_orders(connection, orders))
+    except:
+        raise IOError('remote player cannot be reached')
 
 
-def place_foods(data, data_map, id, letter):
-    """This function adds the location of all fruits in each line
-    Parameters :
-    ----------
-    data : dictionary with all information (dict)
-    data_map :dictionary with all information for each line in the map (dict)
-    id : the id of the fruit (str)
-    letter : the type of the fruit (str)
+def get_remote_orders(connection):
+    """Returns orders from a remote player.
 
-    Version :
-    -----------
-    specification: Youssef Fiher, Omar Ametjaou (v.1 25/03/2022)
-    implementation: Elie Goche(v.1 05/03/2022)
-    """
+    Parameters
+    ----------
+    connection: sockets to receive/send orders (dict of socket.socket)
 
-    data_map["l" + str(data["foods"][id]["location"][0] * 2 - 1)][
-        (data["foods"][id]["location"][1]) * 2 - 1] = letter + get_color_energy(data, id)
+    Returns
+    ----------
+    player_orders: orders given by remote player, a list if they were sent in binary (str or list of Order)
 
+    Raises
+    ------
+    IOError: if remote player cannot be reached
 
-def refresh_map(data, data_map):
-    """This function refresh the map with all modification
-    Parameters :
-    -----------
-    data : dictionary with all information (dict)
-    data_map : dictionary with all information for each line in the map (dict)
+    """
 
-    Version :
-    -----------
-    specification: Youssef Fiher, Omar Ametjaou (v.1 222/03/2022)
-    implementation: Elie Goche, Younes Kouza(v.1 05/03/2022)
-    """
-    for id in data["foods"]:
-        if data["foods"][id]["type"] == "berries":
-            place_foods(data, data_map, id, "b")
-        elif data["foods"][id]["type"] == "apples":
-            place_foods(data, data_map, id, "a")
-        elif data["foods"][id]["type"] == "mice":
-            place_foods(data, data_map, id, "m")
-        elif data["foods"][id]["type"] == "rabbits":
-            place_foods(data, data_map, id, "r")
-        else:
-            place_foods(data, data_map, id, "d")
-
-    for id in data["werewolves"]:
-        add_bonus(data, id)
-        team = data["werewolves"][id]['team']
-        if data["werewolves"][id]["type"] == "alpha":
-            place_werewolves(data, data_map, id, team, "A")
-        elif data["werewolves"][id]["type"] == "omega":
-            place_werewolves(data, data_map, id, team, "O")
-        elif data["werewolves"][id]["type"] == "normal":
-            place_werewolves(data, data_map, id, team, "W")
+    # receive orders (the whole frame, however many packets it takes)
+    start = time.perf_counter()
+    try:
+        if connection.get('pending'):
+            orders = decode_orders(connection['pending'].pop(0))
         else:
-            place_werewolves(data, data_map, id, team, "H")
+            orders = decode_orders(read_frame(connection))
+    except:
+        raise IOError('remote player cannot be reached')
 
+    if 'metrics' in connection:
+        connection['metrics']['nb_received'] += 1
+        connection['metrics']['receive_time'] += time.perf_counter() - start
 
-def show_map(data, data_map):
-    """Show map in the terminal
-    parameters :
-    -----------
-    data : dictionary with all information (dict)
-    data_map : dictionary with all information for each line in the map (dict)
+    return orders
 
-    Version :
-    -----------
-    specification: Youssef Fiher, Omar Ametjaou (v.1 25/03/2022)
-    implementation: Younes Kouza (v.1 10/02/2022)
-    """
-    refresh_map(data, data_map)
-    for line in data_map.values():
-        print(*line, sep='')
 
+# asynchronous connections (same port scheme as above, for a referee hosting several matches)
 
-def add_bonus(data, creature_id):
-    """This function adds the bonus of werewolve in data dictionary
-    Parameters:
+async def wait_for_group_async(group, timeout=None, verbose=False):
+    """Waits for a group to connect on its port.
+
+    Parameters
     ----------
-    data : dictionary with all information (dcit)
-    creature_id : the id of the creature (str)
+    group: id of the group (int)
+    timeout: maximum time to wait in seconds, None to wait forever (float, optional)
+    verbose: True if verbose (bool, optional)
+
+    Returns
+    -------
+    connection: streams to receive/send orders (dict of asyncio.StreamReader/StreamWriter)
+
+    Raises
+    ------
+    IOError: if the port is already in use or the group does not connect in time
+
+    Notes
+    -----
+    The server stops listening as soon as the group is connected, other connections are refused.
 
-    Version :
-    -----------
-    specification: Youssef Fiher, Omar Ametjaou (v.1 21/03/2022)
-    implementation: Youssef Fiher, Omar Ametjaou(v.1 15/03/2022)
     """
-    bonus = 0
-    for werewolve_id in data['werewolves']:
-        if get_creature_team(data, werewolve_id) == get_creature_team(data,
-                                                                      creature_id) and werewolve_id != creature_id:
-            if get_creature_type(data, werewolve_id) == 'normal':
-                if get_distance(data, creature_id, werewolve_id) <= 2:
-                    bonus += 10
-            elif get_creature_type(data, werewolve_id) == 'alpha':
-                if get_distance(data, creature_id, werewolve_id) <= 4:
-                    bonus += 30
-    data["werewolves"][creature_id]["bonus"] = bonus
 
+    accepted = asyncio.get_running_loop().create_future()
 
-def get_object_energy(data, object_id):
-    """This function returns the object energy of the given object id
-    Parameters:
+    def accept(reader, writer):
+        if accepted.done():
+            writer.close()
+        else:
+            accepted.set_result({'in': reader, 'out': writer})
+
+    try:
+        server = await asyncio.start_server(accept, '', 42000 + group, reuse_address=True)
+    except OSError:
+        raise IOError('local port %d already in use by your group or the referee' % (42000 + group))
+
+    if verbose:
+        print(' waiting for group %d on local port %d' % (group, 42000 + group))
+
+    try:
+        return await asyncio.wait_for(accepted, timeout)
+    except asyncio.TimeoutError:
+        raise IOError('group %d did not connect in time' % group)
+    except asyncio.CancelledError:
+        if accepted.done() and not accepted.cancelled():
+            accepted.result()['out'].close()
+        raise
+    finally:
+        server.close()
+
+
+async def gather_connections_async(*coroutines):
+    """Runs coroutines opening connections at the same time, cancelling all of them as soon as one fails.
+
+    Parameters
     ----------
-    data: dictionary with all information (dict)
-    object_id: the id of the object (str)
+    coroutines: coroutines giving a connection dict or a (reader, writer) tuple (coroutine)
 
-    Return:
+    Returns
     -------
-    energy: the energy of the creature
+    results: the result of each coroutine (list)
 
-    Version :
-    -----------
-    specification: Youssef Fiher, Omar Ametjaou (v.1 22/03/2022)
-    implementation: Youssef Fiher, Omar Ametjaou (v.1 02/03/2022)
+    Notes
+    -----
+    When a coroutine fails, the others are cancelled (their servers stop listening) and the connections
+    they already opened are closed, then the error is raised.
 
     """
-    if 'w' in object_id:
-        return data['werewolves'][object_id]['energy']
-    elif 'f' in object_id:
-        return data['foods'][object_id]['energy']
 
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, dict):
+                result['out'].close()
+            elif isinstance(result, tuple):
+                result[1].close()
+        raise
 
-def get_creature_previous_energy(data, creature_id):
-    """This function returns the previous_energy of the given creature id
-    Parameters:
+
+async def connect_async(remote_IP, remote_port, timeout=None, verbose=False):
+    """Connects to a remote port, trying again with increasing delays until it accepts, see create_client_socket.
+
+    Parameters
     ----------
-    data: dictionary with all information (dict)
-    object_id: the id of the creature (str)
+    remote_IP: IP address to connect to (str)
+    remote_port: port to connect to (int)
+    timeout: maximum time to try in seconds, None to try forever (float, optional)
+    verbose: True if verbose (bool, optional)
 
-    Return:
+    Returns
+    -------
+    streams: stream reader and stream writer (tuple)
+
+    Raises
     ------
-    previous_energy: the previous energy of the creature
+    IOError: if the connection is not made in time
 
-    Version :
-    -----------
-    specification: Youssef Fiher, Omar Ametjaou (v.1 22/03/2022)
-    implementation: Youssef Fiher, Omar Ametjaou (v.1 05/03/2022)
     """
-    previous_energy = data['werewolves'][creature_id]['previous_energy']
-    return previous_energy
 
+    loop = asyncio.get_running_loop()
+    deadline = None if timeout is None else loop.time() + timeout
 
-def get_color_energy(data, object_id):
-    """Returns the color energy of the given object
-    Parameters:
-    ----------
-    data: dictionary with all information (dict)
-    object_id: the id of the object (str)
+    if verbose:
+        print(' connecting on %s:%d to send orders' % (remote_IP, remote_port))
 
-    Return:
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            reader, writer = await asyncio.open_connection(remote_IP, remote_port)
+            break
+        except OSError:
+            delay = get_backoff_delay(attempt)
+            if deadline is not None:
+                if loop.time() >= deadline:
+                    raise IOError('%s:%d cannot be reached after %d attempts' % (remote_IP, remote_port, attempt))
+                delay = min(delay, deadline - loop.time())
+            await asyncio.sleep(delay)
+
+    writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return reader, writer
+
+
+async def create_connection_async(your_group, other_group=0, other_IP='127.0.0.1', timeout=None, verbose=False):
+    """Creates a connection with a referee or another group, see create_connection.
+
+    Parameters
+    ----------
+    your_group: id of your group (int)
+    other_group: id of the other group, if there is no referee (int, optional)
+    other_IP: IP address where the referee or the other group is (str, optional)
+    timeout: maximum time to connect in seconds, None to wait forever (float, optional)
+    verbose: True only if connection progress must be displayed (bool, optional)
+
+    Returns
+    -------
+    connection: streams to receive/send orders (dict of asyncio.StreamReader/StreamWriter)
+
+    Notes
+    -----
+    Without referee, the server of your group waits for the other group while connecting to it.
+
+    """
+
+    if other_group == 0:
+        reader, writer = await connect_async(other_IP, 42000 + your_group, timeout, verbose)
+        return {'in': reader, 'out': writer}
+
+    connection_in, (reader, writer) = await gather_connections_async(
+        wait_for_group_async(your_group, timeout, verbose),
+        connect_async(other_IP, 42000 + other_group, timeout, verbose))
+    connection_in['out'] = writer
+    return connection_in
+
+
+async def bind_referee_async(group_1, group_2, timeout=None, verbose=False):
+    """Put a referee between two groups, waiting for both groups at the same time.
+
+    Parameters
+    ----------
+    group_1: id of the first group (int)
+    group_2: id of the second group (int)
+    timeout: maximum time to wait for the groups in seconds, None to wait forever (float, optional)
+    verbose: True only if connection progress must be displayed (bool, optional)
+
+    Returns
+    -------
+    connections: streams to receive/send orders from both players, with keys 1 and 2 (dict)
+
+    Raises
+    ------
+    IOError: if a port is already in use or a group does not connect in time, the other group being
+             disconnected
+
+    """
+
+    connection_1, connection_2 = await gather_connections_async(wait_for_group_async(group_1, timeout, verbose),
+                                                                wait_for_group_async(group_2, timeout, verbose))
+    return {1: connection_1, 2: connection_2}
+
+
+async def close_connection_async(connection):
+    """Closes a connection with a referee or another group.
+
+    Parameters
+    ----------
+    connection: streams to receive/send orders (dict of asyncio.StreamReader/StreamWriter)
+
+    """
+
+    connection['out'].close()
+    try:
+        await connection['out'].wait_closed()
+    except OSError:
+        pass
+
+
+async def notify_remote_orders_async(connection, orders):
+    """Notifies orders to a remote player, see notify_remote_orders.
+
+    Parameters
+    ----------
+    connection: streams to receive/send orders (dict of asyncio.StreamReader/StreamWriter)
+    orders: orders to notify (str or list of Order)
+
+    Raises
+    ------
+    IOError: if remote player cannot be reached
+
+    """
+
+    payload = encode_orders(connection, orders)
+    try:
+        connection['out'].write(FRAME_HEADER.pack(len(payload)) + payload)
+        await connection['out'].drain()
+    except OSError:
+        raise IOError('remote player cannot be reached')
+
+
+async def get_remote_orders_async(connection, timeout=None):
+    """Returns orders from a remote player, see get_remote_orders.
+
+    Parameters
+    ----------
+    connection: streams to receive/send orders (dict of asyncio.StreamReader/StreamWriter)
+    timeout: maximum time to wait for the orders in seconds, None to wait forever (float, optional)
+
+    Returns
+    ----------
+    player_orders: orders given by remote player, a list if they were sent in binary (str or list of Order)
+
+    Raises
+    ------
+    IOError: if remote player cannot be reached or does not answer in time
+
+    Notes
+    -----
+    After a timeout the frame may be half read: the connection must not be used anymore.
+
+    A format negotiation received instead of orders (see negotiate_format) is answered with
+    answer_format_async, then the orders are read: the referee is then able to send orders to that
+    player in its format.
+
+    """
+
+    payload = await read_frame_async(connection, timeout)
+    if payload.startswith(b'formats:'):
+        await answer_format_async(connection, payload)
+        payload = await read_frame_async(connection, timeout)
+    return decode_orders(payload)
+
+
+async def read_frame_async(connection, timeout=None):
+    """Returns the payload of the next frame received on a connection, see read_frame.
+
+    Parameters
+    ----------
+    connection: streams to receive/send orders (dict of asyncio.StreamReader/StreamWriter)
+    timeout: maximum time to wait for the frame in seconds, None to wait forever (float, optional)
+
+    Returns
+    -------
+    payload: the payload of the frame (bytes)
+
+    Raises
+    ------
+    IOError: if remote player cannot be reached or does not answer in time
+
+    """
+
+    async def read():
+        size = FRAME_HEADER.unpack(await connection['in'].readexactly(FRAME_HEADER.size))[0]
+        if size > MAX_FRAME_SIZE:
+            raise IOError('frame of %d bytes is too large' % size)
+        return await connection['in'].readexactly(size)
+
+    try:
+        return await asyncio.wait_for(read(), timeout)
+    except asyncio.TimeoutError:
+        raise IOError('remote player did not answer in time')
+    except (OSError, asyncio.IncompleteReadError):
+        raise IOError('remote player cannot be reached')
+
+
+async def answer_format_async(connection, payload, formats=WIRE_FORMATS):
+    """Answers the format negotiation of a remote player, see negotiate_format.
+
+    Parameters
+    ----------
+    connection: streams to receive/send orders (dict of asyncio.StreamReader/StreamWriter)
+    payload: the negotiation frame received from the remote player (bytes)
+    formats: formats supported (tuple of str, optional)
+
+    Returns
+    -------
+    format: the format of the orders sent to the remote player, kept in connection['format'] (str)
+
+    Raises
+    ------
+    IOError: if remote player cannot be reached
+
+    Notes
+    -----
+    The remote player chooses the first of its own formats which is in the answer, so the same one is
+    chosen here.
+
+    """
+
+    connection['format'] = 'text'
+    for wire_format in payload[len('formats:'):].decode().split(','):
+        if wire_format in formats:
+            connection['format'] = wire_format
+            break
+    answer = ('formats:' + ','.join(formats)).encode()
+    try:
+        connection['out'].write(FRAME_HEADER.pack(len(answer)) + answer)
+        await connection['out'].drain()
+    except OSError:
+        raise IOError('remote player cannot be reached')
+    return connection['format']
+
+
+async def relay_round_async(connections, timeout=None):
+    """Receives the orders of both players of a round and forwards them to the other player.
+
+    Parameters
+    ----------
+    connections: streams of both players, with keys 1 and 2, see bind_referee_async (dict)
+    timeout: maximum time to wait for the orders of each player in seconds (float, optional)
+
+    Returns
+    -------
+    orders: orders of the first and of the second player (tuple of str)
+
+    Raises
+    ------
+    IOError: if a player cannot be reached or does not answer in time
+
+    Notes
+    -----
+    Both players are read at the same time and the orders of a player are forwarded as soon as they
+    arrive, whichever player plays first.
+
+    """
+
+    async def relay(team, other_team):
+        try:
+            orders = await get_remote_orders_async(connections[team], timeout)
+        except IOError as error:
+            raise IOError('player %d: %s' % (team, error))
+        try:
+            await notify_remote_orders_async(connections[other_team], orders)
+        except IOError as error:
+            raise IOError('player %d: %s' % (other_team, error))
+        return orders
+
+    return tuple(await asyncio.gather(relay(1, 2), relay(2, 1)))
+
+
+# game state
+class ObjectTable(Mapping):
+    """Objects of the game (werewolves or foods) stored column by column.
+
+    Each object has an integer index in the columns (arrays) and an id (e.g. 'w1', 'f3').
+    table[object_id] returns an ObjectView which reads and writes the columns, so the table
+    can be used like the dictionary of dictionaries returned by the first version of extract_ano_file.
+
+    Whole columns can be read directly in table.columns (e.g. table.columns["energy"]).
+    """
+    prefix = ""
+    columns_spec = ()
+    codes = {}
+    booleans = ()
+
+    def __init__(self):
+        self.columns = {name: array(typecode) for name, typecode in self.columns_spec}
+        self.fields = ["location"] + [name for name, typecode in self.columns_spec if name not in ("row", "col")]
+        self.ids = []
+        self.index = {}
+        self.alive = array('b')
+        self.nb_alive = 0
+        # undo journal of the game while one is kept (see start_journal)
+        self.journal = None
+        # field, append method of its column and codes of its values (None for integers), used by append
+        self.appenders = [(name, self.columns[name].append,
+                           {value: code for code, value in enumerate(self.codes[name])} if name in self.codes else None)
+                          for name in self.fields[1:]]
+
+    def append(self, **values):
+        """Adds an object to the table and returns its id"""
+        object_id = self.prefix + str(len(self.ids) + 1)
+        self.index[object_id] = len(self.ids)
+        self.ids.append(object_id)
+        self.alive.append(1)
+        self.nb_alive += 1
+        location = values["location"]
+        self.columns["row"].append(location[0])
+        self.columns["col"].append(location[1])
+        for name, append, codes in self.appenders:
+            append(int(values[name]) if codes is None else codes[values[name]])
+        return object_id
+
+    def encode(self, field, value):
+        if field in self.codes:
+            return self.codes[field].index(value)
+        return int(value)
+
+    def copy(self):
+        """Returns a copy of the table, whose columns can be changed without changing this table"""
+        table = self.__class__.__new__(self.__class__)
+        table.columns = {name: column[:] for name, column in self.columns.items()}
+        table.fields = self.fields
+        table.ids = self.ids[:]
+        table.index = self.index.copy()
+        table.alive = self.alive[:]
+        table.nb_alive = self.nb_alive
+        table.journal = None
+        table.appenders = [(name, table.columns[name].append, codes) for name, append, codes in self.appenders]
+        return table
+
+    def get_field(self, object_id, field):
+        """Returns the value of a field of an object"""
+        i = self.index[object_id]
+        if field == "location":
+            return [self.columns["row"][i], self.columns["col"][i]]
+        value = self.columns[field][i]
+        if field in self.codes:
+            return self.codes[field][value]
+        if field in self.booleans:
+            return value == 1
+        return value
+
+    def set_field(self, object_id, field, value):
+        """Changes the value of a field of an object"""
+        i = self.index[object_id]
+        if field == "location":
+            if self.journal is not None:
+                self.journal.append((self.columns["row"], i, self.columns["row"][i]))
+                self.journal.append((self.columns["col"], i, self.columns["col"][i]))
+            self.columns["row"][i] = value[0]
+            self.columns["col"][i] = value[1]
+        else:
+            if self.journal is not None:
+                self.journal.append((self.columns[field], i, self.columns[field][i]))
+            self.columns[field][i] = self.encode(field, value)
+
+    def fill(self, field, value):
+        """Sets the same value to a field of every object"""
+        column = self.columns[field]
+        code = self.encode(field, value)
+        if self.journal is not None:
+            self.journal.extend((column, i, old) for i, old in enumerate(column) if old != code)
+        column[:] = array(column.typecode, [code]) * len(column)
+
+    def __getitem__(self, object_id):
+        if object_id not in self:
+            raise KeyError(object_id)
+        return ObjectView(self, object_id)
+
+    def __delitem__(self, object_id):
+        if object_id not in self:
+            raise KeyError(object_id)
+        if self.journal is not None:
+            self.journal.append((self.alive, self.index[object_id], 1))
+            self.journal.append((self.__dict__, "nb_alive", self.nb_alive))
+        self.alive[self.index[object_id]] = 0
+        self.nb_alive -= 1
+
+    def __contains__(self, object_id):
+        i = self.index.get(object_id)
+        return i is not None and self.alive[i] == 1
+
+    def __iter__(self):
+        alive = self.alive
+        for i, object_id in enumerate(self.ids):
+            if alive[i]:
+                yield object_id
+
+    def __len__(self):
+        return self.nb_alive
+
+    def __repr__(self):
+        return repr({object_id: dict(self[object_id]) for object_id in self})
+
+
+class WerewolfTable(ObjectTable):
+    prefix = "w"
+    columns_spec = (("row", 'i'), ("col", 'i'), ("type", 'b'), ("type_ref", 'b'), ("team", 'b'),
+                    ("previous_energy", 'i'), ("energy", 'i'), ("bonus", 'i'), ("pacified", 'b'),
+                    ("nb_action", 'i'))
+    codes = {"type": ["normal", "alpha", "omega", "human"],
+             "type_ref": ["normal", "alpha", "omega", "human"]}
+    booleans = ("pacified",)
+
+
+class FoodTable(ObjectTable):
+    prefix = "f"
+    columns_spec = (("row", 'i'), ("col", 'i'), ("type", 'b'), ("energy", 'i'))
+    codes = {"type": ["berries", "apples", "mice", "rabbits", "deers"]}
+
+
+class ObjectView(MutableMapping):
+    """One object of an ObjectTable, used like a dictionary of its fields"""
+    __slots__ = ("table", "object_id")
+
+    def __init__(self, table, object_id):
+        self.table = table
+        self.object_id = object_id
+
+    def __getitem__(self, field):
+        return self.table.get_field(self.object_id, field)
+
+    def __setitem__(self, field, value):
+        self.table.set_field(self.object_id, field, value)
+
+    def __delitem__(self, field):
+        raise TypeError("fields of a game object cannot be deleted")
+
+    def __iter__(self):
+        return iter(self.table.fields)
+
+    def __len__(self):
+        return len(self.table.fields)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+def extract_ano_file(ano_file):
+    """Extract all information from the file.ano
+    Parameters :
+    -----------
+    anoFile : the path of the file.ano (str)
+
+    Return :
+    ---------
+    data : dictionary with all information (dictionary)
+
+    Raises :
+    --------
+    ValueError : if a line of the file is not valid, with its line number
+
+    Notes :
+    -------
+    The file is read line by line, each line going straight into the tables of the section it belongs
+    to (map:, werewolves: or foods:), so large maps load in linear time.
+
+    Version :
+    -----------
+    specification: Elie Goche (v.1 19/02/2022)
+    implementation: Elie Goche, Younes Kouza, Youssef Fiher, Omar Ametjaou (v.1 25/02/2022)
+    """
+    data = {}
+    data_werewolves = WerewolfTable()
+    data_foods = FoodTable()
+    section = None
+    # line of each cell already holding a werewolf or a food
+    occupied = {"werewolves": {}, "foods": {}}
+
+    with open(ano_file, "r") as file:
+        for line_number, line in enumerate(file, 1):
+            info = line.split()
+            if info == []:
+                continue
+            if len(info) == 1 and info[0].endswith(":"):
+                section = info[0][:-1]
+                if section not in ("map", "werewolves", "foods"):
+                    raise ValueError("%s line %d: unknown section %s" % (ano_file, line_number, info[0]))
+                if section != "map" and "map" not in data:
+                    raise ValueError("%s line %d: the map: section must come first" % (ano_file, line_number))
+                continue
+
+            try:
+                if section == "map":
+                    if "map" in data:
+                        raise ValueError("the size of the map is given twice")
+                    if len(info) != 2 or int(info[0]) < 1 or int(info[1]) < 1:
+                        raise ValueError("expected 'rows columns'")
+                    data["map"] = [int(info[0]), int(info[1])]
+                elif section == "werewolves":
+                    if len(info) != 4 or info[3] not in ("alpha", "omega", "normal"):
+                        raise ValueError("expected 'team row column alpha|omega|normal'")
+                    location = [int(info[1]), int(info[2])]
+                    check_ano_location(data, location, occupied["werewolves"], line_number)
+                    data_werewolves.append(location=location,
+                                           type=info[3],
+                                           type_ref=info[3],
+                                           team=int(info[0]),
+                                           previous_energy=100,
+                                           energy=100,
+                                           bonus=0,
+                                           pacified=False,
+                                           nb_action=0)
+                elif section == "foods":
+                    if len(info) != 4 or info[2] not in FOOD_LETTERS:
+                        raise ValueError("expected 'row column %s energy'" % "|".join(FOOD_LETTERS))
+                    location = [int(info[0]), int(info[1])]
+                    check_ano_location(data, location, occupied["foods"], line_number)
+                    data_foods.append(location=location,
+                                      type=info[2],
+                                      energy=int(info[3]))
+                else:
+                    raise ValueError("line outside of any section")
+            except ValueError as error:
+                raise ValueError("%s line %d: %s: %r" % (ano_file, line_number, error, line.strip())) from None
+
+    if "map" not in data:
+        raise ValueError("%s: no map: section" % ano_file)
+
+    data["werewolves"] = data_werewolves
+    data["foods"] = data_foods
+    build_occupancy(data)
+    build_bonus_grid(data)
+
+    return data
+
+
+def check_ano_location(data, location, occupied, line_number):
+    """Checks that a location read in a file.ano is in the map and free, then marks it as occupied
+    Parameters:
+    ----------
+    data: dictionary with the size of the map (dict)
+    location: the location (list)
+    occupied: line of each cell already holding an object of the same kind (dict)
+    line_number: the line of the location (int)
+
+    Raises:
+    ------
+    ValueError: if the location is out of the map or already holds an object of the same kind
+    """
+    if not (0 < location[0] <= data["map"][0] and 0 < location[1] <= data["map"][1]):
+        raise ValueError("location %d-%d is out of the %dx%d map" % (location[0], location[1], data["map"][0],
+                                                                    data["map"][1]))
+    cell = (location[0], location[1])
+    if cell in occupied:
+        raise ValueError("location %d-%d is already taken at line %d" % (cell[0], cell[1], occupied[cell]))
+    occupied[cell] = line_number
+
+
+def load_map(map_path, disk_cache=False):
+    """This function returns the data of a map, reading the file.ano only when it changed
+    Parameters:
+    ----------
+    map_path: path of map file (str)
+    disk_cache: True to also keep the parsed map in a binary file next to the map (bool, optional)
+
+    Return:
+    ------
+    data: dictionary with all information, a copy which can be changed freely (dict)
+
+    Notes:
+    ------
+    The parsed maps are kept in map_cache, by path and modification time of the file, and the least
+    recently used ones are dropped beyond MAP_CACHE_SIZE maps.  Every call returns a new copy of the cached
+    data (see clone_data).  With disk_cache, the map is saved as a snapshot in map_path + MAP_CACHE_SUFFIX
+    and read from it (much faster than parsing) as long as the file.ano does not change.
+    """
+    stat = os.stat(map_path)
+    key = (os.path.abspath(map_path), stat.st_mtime_ns, stat.st_size)
+    data = map_cache.get(key)
+    if data is None:
+        if disk_cache:
+            data = read_map_cache(map_path, stat)
+        if data is None:
+            data = extract_ano_file(map_path)
+            if disk_cache:
+                write_map_cache(map_path, stat, data)
+        # drop the older versions of the file
+        for cached_key in [cached_key for cached_key in map_cache if cached_key[0] == key[0]]:
+            del map_cache[cached_key]
+        map_cache[key] = data
+        while len(map_cache) > MAP_CACHE_SIZE:
+            map_cache.popitem(last=False)
+    map_cache.move_to_end(key)
+    return clone_data(data)
+
+
+def read_map_cache(map_path, stat):
+    """This function returns the data saved in the disk cache of a map, None if it is missing or out of date
+    Parameters:
+    ----------
+    map_path: path of map file (str)
+    stat: result of os.stat on the map file (os.stat_result)
+
+    Return:
+    ------
+    data: dictionary with all information (dict)
+    """
+    try:
+        with open(map_path + MAP_CACHE_SUFFIX, "rb") as file:
+            cache = file.read()
+    except OSError:
+        return None
+    if len(cache) < MAP_CACHE_HEADER.size or MAP_CACHE_HEADER.unpack_from(cache) != (stat.st_mtime_ns, stat.st_size):
+        return None
+    try:
+        return load_snapshot(memoryview(cache)[MAP_CACHE_HEADER.size:])["data"]
+    except (ValueError, struct.error):
+        # corrupt cache: the map is parsed again and the cache written again
+        return None
+
+
+def write_map_cache(map_path, stat, data):
+    """This function saves the data of a map in its disk cache, see load_map
+    Parameters:
+    ----------
+    map_path: path of map file (str)
+    stat: result of os.stat on the map file (os.stat_result)
+    data: dictionary with all information, as read from the map (dict)
+
+    Notes:
+    ------
+    The cache is only an optimisation: nothing happens if it cannot be written.  It is written in a
+    temporary file then renamed, so that other processes (e.g. tournament workers) never read a half
+    written cache.
+    """
+    game = {"data": data, "nb_round": 0, "nb_round_without_fight": -1, "game_over": False, "winner": None,
+            "seed": None, "rng": random.Random(0)}
+    cache_path = map_path + MAP_CACHE_SUFFIX
+    temporary_path = "%s.%d.tmp" % (cache_path, os.getpid())
+    try:
+        with open(temporary_path, "wb") as file:
+            file.write(MAP_CACHE_HEADER.pack(stat.st_mtime_ns, stat.st_size) + dump_snapshot(game))
+        os.replace(temporary_path, cache_path)
+    except OSError:
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+
+
+def clone_data(data):
+    """This function returns a copy of the data of a game, which can be changed without changing the original
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+
+    Return:
+    ------
+    copy: the copy (dict)
+
+    Notes:
+    ------
+    The columns of the tables are copied as arrays and the indexes as dictionaries (no object is
+    copied one by one in Python).  The distance fields are not copied: they are computed again when needed.
+    """
+    return {"map": data["map"][:],
+            "werewolves": data["werewolves"].copy(),
+            "foods": data["foods"].copy(),
+            "occupancy": {object_name: cells.copy() for object_name, cells in data["occupancy"].items()},
+            "food_buckets": {bucket: foods.copy() for bucket, foods in data["food_buckets"].items()},
+            "distance_fields": {},
+            "bonus_grid": data["bonus_grid"].copy(),
+            "bonus_dirty": data["bonus_dirty"].copy(),
+            "fallen": data["fallen"].copy()}
+
+
+def clone_game(game):
+    """This function returns a copy of the state of a game, which can be played without changing the original
+    Parameters:
+    ----------
+    game: state of the game (dict)
+
+    Return:
+    ------
+    copy: the copy, with its own data, map and random generator in the same state (dict)
+    """
+    rng = random.Random()
+    rng.setstate(game["rng"].getstate())
+    copy = {key: value for key, value in game.items()
+            if key not in ("renderer", "data", "data_map", "mcts_executor", "mcts_stats")}
+    copy.update({"data": clone_data(game["data"]),
+                 "data_map": {line: cells[:] for line, cells in game["data_map"].items()},
+                 "rng": rng,
+                 "phase_timings": dict(game["phase_timings"])})
+    return copy
+
+
+def start_journal(data):
+    """This function starts recording the changes made to the data of a game, so that they can be undone
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+
+    Notes:
+    ------
+    While the journal is kept, each change made by the rules (move_creature, fight_creature, apply_damages,
+    feed_creature, pacification, refresh_creatures, begin_round...) adds to data["journal"] the container
+    changed, the key and the old value, so a round is undone in a time proportional to its changes
+    (see journal_mark and undo_journal).  The display (data_map) and the random generator of the game are
+    not recorded.
+    """
+    data["journal"] = []
+    data["werewolves"].journal = data["journal"]
+    data["foods"].journal = data["journal"]
+
+
+def stop_journal(data):
+    """This function stops recording the changes made to the data of a game and forgets the journal
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+    """
+    data.pop("journal", None)
+    data["werewolves"].journal = None
+    data["foods"].journal = None
+
+
+def journal_item(journal, container, key):
+    """This function records the old value of an item of an array or a dictionary before it is changed
+    Parameters:
+    ----------
+    journal: the journal (list)
+    container: the array or the dictionary (array or dict)
+    key: the index or the key of the item (int or hashable)
+    """
+    if isinstance(container, dict):
+        journal.append((container, key, container.get(key, JOURNAL_MISSING)))
+    else:
+        journal.append((container, key, container[key]))
+
+
+def journal_member(journal, container, member):
+    """This function records whether a member was in a set before it is added or removed
+    Parameters:
+    ----------
+    journal: the journal (list)
+    container: the set (set)
+    member: the member (hashable)
+    """
+    journal.append((container, member, member in container))
+
+
+def journal_mark(data):
+    """This function returns the position of the journal, to undo the changes made after it
+    Parameters:
+    ----------
+    data: dictionary with all information, with a journal (dict)
+
+    Return:
+    ------
+    mark: the number of changes recorded so far (int)
+    """
+    return len(data["journal"])
+
+
+def undo_journal(data, mark=0):
+    """This function undoes the changes recorded in the journal after the given mark
+    Parameters:
+    ----------
+    data: dictionary with all information, with a journal (dict)
+    mark: position of the journal to go back to, see journal_mark (int, optional)
+
+    Return:
+    ------
+    redo: the changes to make them again with redo_journal (list)
+    """
+    journal = data["journal"]
+    redo = []
+    while len(journal) > mark:
+        redo.append(swap_journal_entry(journal.pop()))
+    # the distance fields only depend on the occupied cells, they are computed again when needed
+    data["distance_fields"].clear()
+    return redo
+
+
+def redo_journal(data, redo):
+    """This function makes again changes undone by undo_journal
+    Parameters:
+    ----------
+    data: dictionary with all information, with a journal (dict)
+    redo: the changes returned by undo_journal (list)
+
+    Notes:
+    ------
+    The changes are recorded again in the journal, so they can be undone again.
+    """
+    journal = data["journal"]
+    while redo != []:
+        journal.append(swap_journal_entry(redo.pop()))
+    data["distance_fields"].clear()
+
+
+def swap_journal_entry(entry):
+    """This function puts back the value recorded in an entry of the journal
+    Parameters:
+    ----------
+    entry: the container, the key and the value to put back (tuple)
+
+    Return:
+    ------
+    entry: the container, the key and the value replaced, to go back again (tuple)
+    """
+    container, key, value = entry
+    if isinstance(container, set):
+        present = key in container
+        if value:
+            container.add(key)
+        else:
+            container.discard(key)
+        return container, key, present
+    if isinstance(container, dict):
+        current = container.get(key, JOURNAL_MISSING)
+        if value is JOURNAL_MISSING:
+            container.pop(key, None)
+        else:
+            container[key] = value
+        return container, key, current
+    current = container[key]
+    container[key] = value
+    return container, key, current
+
+
+def build_occupancy(data):
+    """This function builds the index of the occupied cells of the map
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+
+    Notes:
+    ------
+    data["occupancy"] maps the (row, column) of each occupied cell to the id of the werewolf and of the food
+    on it, so that looking for what is on a cell does not walk every creature.  The index must be updated
+    with set_occupancy and clear_occupancy each time an object moves or disappears.
+
+    The foods are also grouped by square buckets of FOOD_BUCKET_SIZE cells in data["food_buckets"], used to
+    find the foods near a location (see get_nearest_food and get_foods_within).
+    """
+    data["occupancy"] = {"werewolves": {}, "foods": {}}
+    data["food_buckets"] = {}
+    data["distance_fields"] = {}
+    for object_name in ("werewolves", "foods"):
+        table = data[object_name]
+        locations = compress(zip(table.columns["row"], table.columns["col"]), table.alive)
+        data["occupancy"][object_name] = dict(zip(locations, compress(table.ids, table.alive)))
+    buckets = data["food_buckets"]
+    for (row, col), food_id in data["occupancy"]["foods"].items():
+        buckets.setdefault((row // FOOD_BUCKET_SIZE, col // FOOD_BUCKET_SIZE), {})[food_id] = (row, col)
+
+
+def set_occupancy(data, object_id, location):
+    """This function records the given object on the given cell of the occupancy index
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+    object_id: the id of the object (str)
+    location: the location of the object (list)
+    """
+    object_name = get_object_name(object_id)
+    journal = data.get("journal")
+    if journal is not None:
+        journal_item(journal, data["occupancy"][object_name], (location[0], location[1]))
+    data["occupancy"][object_name][(location[0], location[1])] = object_id
+    if object_name == "werewolves":
+        data["distance_fields"].clear()
+    else:
+        data["distance_fields"].pop(None, None)
+        bucket = (location[0] // FOOD_BUCKET_SIZE, location[1] // FOOD_BUCKET_SIZE)
+        if journal is not None:
+            journal_item(journal, data["food_buckets"], bucket)
+            data["food_buckets"][bucket] = data["food_buckets"].get(bucket, {}).copy()
+        data["food_buckets"].setdefault(bucket, {})[object_id] = (location[0], location[1])
+
+
+def clear_occupancy(data, object_id, location):
+    """This function removes the given object from the given cell of the occupancy index
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+    object_id: the id of the object (str)
+    location: the location of the object (list)
+    """
+    object_name = get_object_name(object_id)
+    cells = data["occupancy"][object_name]
+    if cells.get((location[0], location[1])) == object_id:
+        journal = data.get("journal")
+        if journal is not None:
+            journal_item(journal, cells, (location[0], location[1]))
+        del cells[(location[0], location[1])]
+        if object_name == "werewolves":
+            data["distance_fields"].clear()
+        else:
+            data["distance_fields"].pop(None, None)
+            bucket = (location[0] // FOOD_BUCKET_SIZE, location[1] // FOOD_BUCKET_SIZE)
+            if journal is not None:
+                journal_item(journal, data["food_buckets"], bucket)
+                data["food_buckets"][bucket] = data["food_buckets"][bucket].copy()
+            del data["food_buckets"][bucket][object_id]
+            if len(data["food_buckets"][bucket]) == 0:
+                del data["food_buckets"][bucket]
+
+
+def create_empty_map(map_size):
+    """This function returns a dictionary with all information for each line in the map
+    Parameters :
+    ----------
+    map_location : the size of the map (list)
+
+    Return :
+    ------
+    data_map : dictionary with all information for each line in the map
+
+    Version :
+    -----------
+    specification: Elie Goche (v.1 19/02/2022)
+    implementation: Elie Goche, Younes Kouza (v.1 25/02/2022)
+    """
+    data_map = {}
+    for line in range(map_size[0] * 2 + 1):
+        if line % 2 != 1:
+            data_map["l" + str(line)] = ["+", "--"] * map_size[1] + ["+"]
+        else:
+            data_map["l" + str(line)] = ["|", "  "] * map_size[1] + ["|"]
+    return data_map
+
+
+def get_werewolf_cell(data, id, team, letter):
+    """This function returns what is shown on the cell of a werewolf
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+    id: the id of the werewolve (str)
+    team: the team of the werewolve (int)
+    letter: the type of the werewolve (A=alpha, O=omega, W=werewolve, H=humain) (str)
+
+    Return:
+    ------
+    cell: the letter of the werewolf in the colour of its team with its energy level (str)
+    """
+    if team != 1:
+        team = 2
+    if letter == "H":
+        return get_palette(term)["letters"][(team, "H")]
+    return get_palette(term)["letters"][(team, letter)] + get_color_energy(data, id)
+
+
+def get_food_cell(data, id, letter):
+    """This function returns what is shown on the cell of a food
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+    id: the id of the food (str)
+    letter: the type of the food (str)
+
+    Return:
+    ------
+    cell: the letter of the food with its energy level (str)
+    """
+    return letter + get_color_energy(data, id)
+
+
+def get_cells(data):
+    """This function returns what is shown on each occupied cell of the map
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+
+    Return:
+    ------
+    cells: what is shown on each occupied cell, by (row, column) (dict)
+    """
+    cells = {}
+    for food_id in data["foods"]:
+        location = get_object_location(data, food_id)
+        letter = FOOD_LETTERS.get(data["foods"].get_field(food_id, "type"), "d")
+        cells[(location[0], location[1])] = get_food_cell(data, food_id, letter)
+    for creature_id in data["werewolves"]:
+        location = get_object_location(data, creature_id)
+        letter = WEREWOLF_LETTERS[get_creature_type(data, creature_id)]
+        cells[(location[0], location[1])] = get_werewolf_cell(data, creature_id,
+                                                              get_creature_team(data, creature_id), letter)
+    return cells
+
+
+def create_renderer(max_fps=30):
+    """This function creates a renderer which only redraws the cells that changed since the last frame
+    Parameters:
+    ----------
+    max_fps: maximum number of frames shown per second (int, optional)
+
+    Return:
+    ------
+    renderer: state of the renderer (dict)
+    """
+    return {"cells": None, "last_frame": None, "min_interval": 1 / max_fps, "nb_bytes": 0}
+
+
+def draw_frame(data, renderer, status_lines=(), force=False):
+    """This function draws the map in the terminal, only writing the cells that changed since the last frame
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+    renderer: state of the renderer (dict)
+    status_lines: lines shown under the map (list of str, optional)
+    force: True to draw the frame even if the last one is too recent (bool, optional)
+
+    Return:
+    ------
+    drawn: True if the frame has been drawn (bool)
+
+    Notes:
+    ------
+    The first frame clears the screen and draws the whole board, the next ones only move the cursor on
+    the cells whose content changed.  Frames coming faster than max_fps are skipped (the cells they changed
+    are drawn with the next frame).
+    """
+    now = time.perf_counter()
+    if not force and renderer["last_frame"] is not None and now - renderer["last_frame"] < renderer["min_interval"]:
+        return False
+    renderer["last_frame"] = now
+
+    cells = get_cells(data)
+    output = []
+    if renderer["cells"] is None:
+        output.append(term.home + term.clear)
+        for line in create_empty_map(data["map"]).values():
+            output.append("".join(line) + "\n")
+        previous_cells = {}
+    else:
+        previous_cells = renderer["cells"]
+
+    for cell in previous_cells:
+        if cell not in cells:
+            output.append(term.move_xy(cell[1] * 3 - 2, cell[0] * 2 - 1) + "  ")
+    for cell, content in cells.items():
+        if previous_cells.get(cell) != content:
+            output.append(term.move_xy(cell[1] * 3 - 2, cell[0] * 2 - 1) + content)
+    renderer["cells"] = cells
+
+    output.append(term.move_xy(0, data["map"][0] * 2 + 1))
+    for line in status_lines:
+        output.append(term.clear_eol + line + "\n")
+    output.append(term.clear_eos)
+
+    output = "".join(output)
+    renderer["nb_bytes"] += len(output)
+    print(output, end="", flush=True)
+    return True
+
+
+def refresh_creatures(data):
+    """This function applies the consequences of the last actions on the werewolves
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+
+    Notes:
+    ------
+    The werewolves (except the alphas) whose energy fell to 0 become humans, then the bonus of the
+    werewolves whose neighbourhood changed is computed again.
+    """
+    for creature_id in data["fallen"]:
+        if get_object_energy(data, creature_id) <= 0 and get_creature_type(data, creature_id) != "alpha":
+            data["werewolves"][creature_id]["energy"] = 0
+            set_creature_type(data, creature_id, "human")
+    if data.get("journal") is not None:
+        data["journal"].extend((data["fallen"], creature_id, True) for creature_id in data["fallen"])
+    data["fallen"].clear()
+    update_bonuses(data)
+
+
+def set_creature_type(data, creature_id, creature_type):
+    """This function changes the type of the given creature and the bonus it gives to its team
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+    creature_id: the id of the creature (str)
+    creature_type: the new type of the creature (str)
+    """
+    old_type = get_creature_type(data, creature_id)
+    if old_type != creature_type:
+        location = get_object_location(data, creature_id)
+        add_bonus_influence(data, creature_id, location, old_type, -1)
+        data["werewolves"][creature_id]["type"] = creature_type
+        add_bonus_influence(data, creature_id, location, creature_type, +1)
+
+
+def build_bonus_grid(data):
+    """This function builds the grid of the bonus given by the werewolves to their team
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+
+    Notes:
+    ------
+    data["bonus_grid"] maps (team, row, column) to the bonus that a werewolf of the team gets on this cell:
+    10 for each normal werewolf of the team at distance 2 or less, 30 for each alpha at distance 4 or less.
+    The grid is updated with add_bonus_influence when a werewolf moves or changes type, and the werewolves
+    whose bonus may have changed are kept in data["bonus_dirty"] until update_bonuses is called.
+    """
+    grid = {}
+    werewolves = data["werewolves"]
+    columns = werewolves.columns
+    types = werewolves.codes["type"]
+    nb_rows, nb_cols = data["map"]
+    for i, (alive, creature_type, team, row, col) in enumerate(zip(werewolves.alive, columns["type"], columns["team"],
+                                                                     columns["row"], columns["col"])):
+        if alive and types[creature_type] in BONUS_RULES:
+            value, radius = BONUS_RULES[types[creature_type]]
+            for grid_row in range(max(1, row - radius), min(nb_rows, row + radius) + 1):
+                for grid_col in range(max(1, col - radius), min(nb_cols, col + radius) + 1):
+                    key = (team, grid_row, grid_col)
+                    grid[key] = grid.get(key, 0) + value
+    data["bonus_grid"] = grid
+    # every bonus has to be computed once
+    data["bonus_dirty"] = set(werewolves)
+    data["fallen"] = set()
+
+
+def add_bonus_influence(data, creature_id, location, creature_type, sign):
+    """This function adds (sign=+1) or removes (sign=-1) the bonus given by a werewolf around its location
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+    creature_id: the id of the werewolf (str)
+    location: the location of the werewolf (list)
+    creature_type: the type of the werewolf (str)
+    sign: +1 to add the bonus, -1 to remove it (int)
+    """
+    journal = data.get("journal")
+    if journal is not None:
+        journal_member(journal, data["bonus_dirty"], creature_id)
+    data["bonus_dirty"].add(creature_id)
+    if creature_type not in BONUS_RULES:
+        return
+    value, radius = BONUS_RULES[creature_type]
+    team = get_creature_team(data, creature_id)
+    grid = data["bonus_grid"]
+    cells = data["occupancy"]["werewolves"]
+    dirty = data["bonus_dirty"]
+    for row in range(max(1, location[0] - radius), min(data["map"][0], location[0] + radius) + 1):
+        for col in range(max(1, location[1] - radius), min(data["map"][1], location[1] + radius) + 1):
+            key = (team, row, col)
+            if journal is not None:
+                journal_item(journal, grid, key)
+            bonus = grid.get(key, 0) + sign * value
+            if bonus == 0:
+                grid.pop(key, None)
+            else:
+                grid[key] = bonus
+            neighbour_id = cells.get((row, col))
+            if neighbour_id is not None:
+                if journal is not None:
+                    journal_member(journal, dirty, neighbour_id)
+                dirty.add(neighbour_id)
+
+
+def update_bonuses(data):
+    """This function computes again the bonus of the werewolves whose neighbourhood changed
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+    """
+    journal = data.get("journal")
+    for creature_id in data["bonus_dirty"]:
+        add_bonus(data, creature_id)
+        if journal is not None:
+            journal.append((data["bonus_dirty"], creature_id, True))
+    data["bonus_dirty"].clear()
+
+
+def add_bonus(data, creature_id):
+    """This function adds the bonus of werewolve in data dictionary
+    Parameters:
+    ----------
+    data : dictionary with all information (dcit)
+    creature_id : the id of the creature (str)
+
+    Version :
+    -----------
+    specification: Youssef Fiher, Omar Ametjaou (v.1 21/03/2022)
+    implementation: Youssef Fiher, Omar Ametjaou(v.1 15/03/2022)
+    """
+    row, col = get_object_location(data, creature_id)
+    bonus = data["bonus_grid"].get((get_creature_team(data, creature_id), row, col), 0)
+    # a werewolf does not give a bonus to itself
+    creature_type = get_creature_type(data, creature_id)
+    if creature_type in BONUS_RULES:
+        bonus -= BONUS_RULES[creature_type][0]
+    werewolves = data["werewolves"]
+    if werewolves.journal is not None:
+        journal_item(werewolves.journal, werewolves.columns["bonus"], werewolves.index[creature_id])
+    werewolves.columns["bonus"][werewolves.index[creature_id]] = bonus
+
+
+def get_object_energy(data, object_id):
+    """This function returns the object energy of the given object id
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+    object_id: the id of the object (str)
+
+    Return:
+    -------
+    energy: the energy of the creature
+
+    Version :
+    -----------
+    specification: Youssef Fiher, Omar Ametjaou (v.1 22/03/2022)
+    implementation: Youssef Fiher, Omar Ametjaou (v.1 02/03/2022)
+
+    """
+    table = data[get_object_name(object_id)]
+    return table.columns['energy'][table.index[object_id]]
+
+
+def get_creature_previous_energy(data, creature_id):
+    """This function returns the previous_energy of the given creature id
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+    object_id: the id of the creature (str)
+
+    Return:
+    ------
+    previous_energy: the previous energy of the creature
+
+    Version :
+    -----------
+    specification: Youssef Fiher, Omar Ametjaou (v.1 22/03/2022)
+    implementation: Youssef Fiher, Omar Ametjaou (v.1 05/03/2022)
+    """
+    previous_energy = data['werewolves'].get_field(creature_id, 'previous_energy')
+    return previous_energy
+
+
+def get_color_energy(data, object_id):
+    """Returns the color energy of the given object
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+    object_id: the id of the object (str)
+
+    Return:
     ------
     color: the color energy of the object
 
@@ -634,54 +1979,66 @@ def get_color_energy(data, object_id):
     specification: Youssef Fiher, Omar Ametjaou (v.1 22/03/2022)
     implementation: Elie Goche, Omar Ametjaou (v.1 12/03/2022)
     """
-    if "w" in object_id:
-        if data["werewolves"][object_id]["energy"] == 100:
-            return term.darkgreen_reverse(" ")
-        elif data["werewolves"][object_id]["energy"] > 90:
-            return term.green3_reverse(" ")
-        elif data["werewolves"][object_id]["energy"] > 80:
-            return term.green_reverse(" ")
-        elif data["werewolves"][object_id]["energy"] > 70:
-            return term.greenyellow_reverse(" ")
-        elif data["werewolves"][object_id]["energy"] > 60:
-            return term.darkolivegreen1_reverse(" ")
-        elif data["werewolves"][object_id]["energy"] > 50:
-            return term.yellow2_reverse(" ")
-        elif data["werewolves"][object_id]["energy"] > 40:
-            return term.gold_reverse(" ")
-        elif data["werewolves"][object_id]["energy"] > 30:
-            return term.orange_reverse(" ")
-        elif data["werewolves"][object_id]["energy"] > 20:
-            return term.darkorange_reverse(" ")
-        elif data["werewolves"][object_id]["energy"] > 10:
-            return term.orangered_reverse(" ")
-        elif data["werewolves"][object_id]["energy"] > 1:
-            return term.red3_reverse(" ")
-        else:
-            return " "
+    palette = get_palette(term)
+    energy = get_object_energy(data, object_id)
+    if get_object_name(object_id) == "werewolves":
+        colors = palette["werewolves"]
     else:
-        if data["foods"][object_id]["energy"] == 500:
-            return term.darkgreen_reverse(" ")
-        elif data["foods"][object_id]["energy"] > 450:
-            return term.green3_reverse(" ")
-        elif data["foods"][object_id]["energy"] > 350:
-            return term.green_reverse(" ")
-        elif data["foods"][object_id]["energy"] > 300:
-            return term.greenyellow_reverse(" ")
-        elif data["foods"][object_id]["energy"] > 250:
-            return term.darkolivegreen1_reverse(" ")
-        elif data["foods"][object_id]["energy"] > 200:
-            return term.yellow2_reverse(" ")
-        elif data["foods"][object_id]["energy"] > 150:
-            return term.orange_reverse(" ")
-        elif data["foods"][object_id]["energy"] > 100:
-            return term.darkorange_reverse(" ")
-        elif data["foods"][object_id]["energy"] > 50:
-            return term.orangered_reverse(" ")
-        elif data["foods"][object_id]["energy"] > 1:
-            return term.red3_reverse(" ")
-        else:
-            return " "
+        colors = palette["foods"]
+    if energy < 0:
+        return " "
+    return colors[min(energy, len(colors) - 1)]
+
+
+def get_palette(terminal):
+    """Returns the escape sequences used to show the map with the given terminal, computed once
+    Parameters:
+    ----------
+    terminal: the terminal where the map is shown (blessed.Terminal)
+
+    Return:
+    ------
+    palette: colour of each energy for werewolves and foods, letter of each team (dict)
+
+    Notes:
+    ------
+    palette["werewolves"][energy] and palette["foods"][energy] give the colour of an energy level, the last
+    item being used for all greater energies.  palette["letters"][(team, letter)] gives the letter of a
+    werewolf in the colour of its team ("H " for humans, which have no energy level).
+    """
+    palette = palettes.get(id(terminal))
+    if palette is not None and palette["terminal"] is terminal:
+        return palette
+
+    werewolf_colors = [(100, "darkgreen"), (90, "green3"), (80, "green"), (70, "greenyellow"),
+                       (60, "darkolivegreen1"), (50, "yellow2"), (40, "gold"), (30, "orange"),
+                       (20, "darkorange"), (10, "orangered"), (1, "red3")]
+    food_colors = [(500, "darkgreen"), (450, "green3"), (350, "green"), (300, "greenyellow"),
+                   (250, "darkolivegreen1"), (200, "yellow2"), (150, "orange"), (100, "darkorange"),
+                   (50, "orangered"), (1, "red3")]
+    palette = {"terminal": terminal, "letters": {}}
+    for name, colors in (("werewolves", werewolf_colors), ("foods", food_colors)):
+        sequences = {color: getattr(terminal, color + "_reverse")(" ") for limit, color in colors}
+        top_energy, top_color = colors[0]
+        table = []
+        # energy == top energy has its own colour, greater energies use the next one
+        for energy in range(top_energy + 2):
+            sequence = " "
+            if energy == top_energy:
+                sequence = sequences[top_color]
+            else:
+                for limit, color in colors[1:]:
+                    if energy > limit:
+                        sequence = sequences[color]
+                        break
+            table.append(sequence)
+        palette[name] = table
+    for team, color in ((1, terminal.lightblue1), (2, terminal.orangered)):
+        for letter in WEREWOLF_LETTERS.values():
+            palette["letters"][(team, letter)] = color(letter)
+        palette["letters"][(team, "H")] = color("H ")
+    palettes[id(terminal)] = palette
+    return palette
 
 
 def get_id_from_location(data, location):
@@ -696,13 +2053,38 @@ def get_id_from_location(data, location):
     specification: Youssef Fiher, Omar Ametjaou (v.1 22/03/2022)
     implementation: Elie Goche, Younes Kouza (v.1 05/03/2022)
     """
-    for creature_id in data["werewolves"]:
-        if data["werewolves"][creature_id]["location"] == location:
-            return creature_id
+    creature_id = get_werewolf_id_from_location(data, location)
+    if creature_id is not None:
+        return creature_id
+    return get_food_id_from_location(data, location)
 
-    for food_id in data["foods"]:
-        if data["foods"][food_id]["location"] == location:
-            return food_id
+
+def get_werewolf_id_from_location(data, location):
+    """This function returns the id of the werewolf on the given location
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+    location: the location of the werewolf (list)
+
+    Return:
+    ------
+    creature_id: the id of the werewolf, None if there is no werewolf (str)
+    """
+    return data["occupancy"]["werewolves"].get((location[0], location[1]))
+
+
+def get_food_id_from_location(data, location):
+    """This function returns the id of the food on the given location
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+    location: the location of the food (list)
+
+    Return:
+    ------
+    food_id: the id of the food, None if there is no food (str)
+    """
+    return data["occupancy"]["foods"].get((location[0], location[1]))
 
 
 def get_nearest_integer(n):
@@ -742,7 +2124,9 @@ def get_creature_bonus(data, creature_id):
     specification: Youssef Fiher, Omar Ametjaou (v.1 22/03/2022)
     implementation: Youssef Fiher, Omar Ametjaou (v.1 05/03/2022)
     """
-    return data["werewolves"][creature_id]["bonus"]
+    if data["bonus_dirty"]:
+        update_bonuses(data)
+    return data["werewolves"].get_field(creature_id, "bonus")
 
 
 def get_creature_damage(data, creature_id):
@@ -780,9 +2164,9 @@ def get_object_name(object_id):
     specification: Youssef Fiher, Omar Ametjaou (v.1 22/03/2022)
     implementation: Elie Goche (v.1 05/03/2022)
     """
-    if 'w' in object_id:
+    if object_id[0] == 'w':
         return 'werewolves'
-    elif 'f' in object_id:
+    elif object_id[0] == 'f':
         return 'foods'
 
 
@@ -802,10 +2186,9 @@ def get_object_location(data, object_id):
     specification: Youssef Fiher, Omar Ametjaou (v.1 22/03/2022)
     implementation: Elie Goche (v.1 05/03/2022)
     """
-    if 'w' in object_id:
-        return data["werewolves"][object_id]["location"]
-    elif 'f' in object_id:
-        return data["foods"][object_id]["location"]
+    table = data[get_object_name(object_id)]
+    i = table.index[object_id]
+    return [table.columns["row"][i], table.columns["col"][i]]
 
 
 def get_distance(data, object1_id, object2_id):
@@ -825,13 +2208,70 @@ def get_distance(data, object1_id, object2_id):
     specification: Omar Ametjaou, Youssef Fiher (v.1 22/03/2022)
     implementation: Omar Ametjaou, Youssef Fiher (v.1 05/03/2022)
     """
-    r1 = data[get_object_name(object1_id)][object1_id]["location"][0]
-    c1 = data[get_object_name(object1_id)][object1_id]['location'][1]
-    r2 = data[get_object_name(object2_id)][object2_id]['location'][0]
-    c2 = data[get_object_name(object2_id)][object2_id]['location'][1]
+    r1, c1 = get_object_location(data, object1_id)
+    r2, c2 = get_object_location(data, object2_id)
     return max(abs(r2 - r1), abs(c2 - c1))
 
 
+def get_neighbourhood(radius):
+    """This function returns the moves leading to all the cells at a given distance or less
+    Parameters:
+    ----------
+    radius: the maximum distance (int)
+
+    Return:
+    ------
+    offsets: (row, column) differences of the cells, sorted by distance (list of tuple)
+
+    Notes:
+    ------
+    The tables of the distances used by the rules (1, 2, 4 and 6) are computed when the module is loaded,
+    the others the first time they are asked.
+    """
+    offsets = neighbourhoods.get(radius)
+    if offsets is None:
+        offsets = [(d_row, d_col) for d_row in range(-radius, radius + 1) for d_col in range(-radius, radius + 1)]
+        offsets.sort(key=lambda offset: max(abs(offset[0]), abs(offset[1])))
+        neighbourhoods[radius] = offsets
+    return offsets
+
+
+def within(data, location, radius, object_name="werewolves"):
+    """This function gives the objects at the given distance or less from a location
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+    location: the location of the center (list)
+    radius: the maximum distance (int)
+    object_name: 'werewolves' or 'foods' (str, optional)
+
+    Return:
+    ------
+    object_ids: the id of the objects, from the nearest to the farthest (iterator of str)
+
+    Notes:
+    ------
+    Only the (2 * radius + 1)² cells around the location are looked at, unless there are less objects
+    than cells: then the objects are checked one by one.
+    """
+    cells = data["occupancy"][object_name]
+    row, col = location[0], location[1]
+    if (2 * radius + 1) ** 2 > len(cells):
+        found = []
+        for (object_row, object_col), object_id in cells.items():
+            distance = max(abs(object_row - row), abs(object_col - col))
+            if distance <= radius:
+                found.append((distance, object_id))
+        found.sort(key=lambda item: item[0])
+        for distance, object_id in found:
+            yield object_id
+    else:
+        for d_row, d_col in get_neighbourhood(radius):
+            object_id = cells.get((row + d_row, col + d_col))
+            if object_id is not None:
+                yield object_id
+
+
 def get_creature_team(data, creature_id):
     """This function returns the team of the given creature
     Parameters:
@@ -848,8 +2288,9 @@ def get_creature_team(data, creature_id):
     specification: Youssef Fiher, Omar Ametjaou (v.1 22/03/2022)
     implementation: Youssef Fiher, Omar Ametjaou (v.1 05/03/2022)
     """
-    if "w" in creature_id:
-        return data["werewolves"][creature_id]["team"]
+    if creature_id[0] == "w":
+        werewolves = data["werewolves"]
+        return werewolves.columns["team"][werewolves.index[creature_id]]
 
 
 def get_creature_type_ref(data, creature_id):
@@ -868,7 +2309,7 @@ def get_creature_type_ref(data, creature_id):
     specification: Youssef Fiher, Omar Ametjaou (v.1 22/03/2022)
     implementation: Elie Goche (v.1 05/03/2022)
     """
-    return data['werewolves'][creature_id]['type_ref']
+    return data['werewolves'].get_field(creature_id, 'type_ref')
 
 
 def get_creature_type(data, creature_id):
@@ -887,7 +2328,8 @@ def get_creature_type(data, creature_id):
     specification: Youssef Fiher, Omar Ametjaou (v.1 22/03/2022)
     implementation: Youssef Fiher, Omar Ametjaou (v.1 05/03/2022)
     """
-    return data['werewolves'][creature_id]['type']
+    werewolves = data['werewolves']
+    return werewolves.codes['type'][werewolves.columns['type'][werewolves.index[creature_id]]]
 
 
 def get_creature_nb_action(data, creature_id):
@@ -906,7 +2348,7 @@ def get_creature_nb_action(data, creature_id):
     specification: Youssef Fiher, Omar Ametjaou (v.1 22/03/2022)
     implementation: Elie Goche (v.1 05/03/2022)
     """
-    return data['werewolves'][creature_id]['nb_action']
+    return data['werewolves'].get_field(creature_id, 'nb_action')
 
 
 def set_pacify_false_for_all(data):
@@ -920,8 +2362,7 @@ def set_pacify_false_for_all(data):
     specification: Youssef Fiher, Omar Ametjaou (v.1 22/03/2022)
     implementation: Elie Goche (v.1 05/03/2022)
     """
-    for id in data["werewolves"]:
-        data["werewolves"][id]["pacified"] = False
+    data["werewolves"].fill("pacified", False)
 
 
 def set_nb_action_to_0_for_all(data):
@@ -935,17 +2376,17 @@ def set_nb_action_to_0_for_all(data):
     specification: Youssef Fiher, Omar Ametjaou (v.1 22/03/2022)
     implementation: Elie Goche (v.1 05/03/2022)
     """
-    for id in data["werewolves"]:
-        data["werewolves"][id]["nb_action"] = 0
+    data["werewolves"].fill("nb_action", 0)
 
 
-def get_instruction(data, data_map, list_instruction):
+def get_instruction(data, data_map, list_instruction, timings=None):
     """This function executes the instructions of the given list of instructions
     Parameters:
     -----------
     data: dictionary with all information (dict)
     data_map: dictionary with all information for each line in the map (dict)
-    list_instruction: a list of instructions to be executed (list)
+    list_instruction: a list of orders to be executed (list of Order)
+    timings: time spent in each phase, increased by this function (dict, optional)
 
     Version :
     -----------
@@ -954,101 +2395,172 @@ def get_instruction(data, data_map, list_instruction):
     """
     set_pacify_false_for_all(data)
     set_nb_action_to_0_for_all(data)
-    sorted_list_instruction = sort_instruction(list_instruction)
-    move = "@"
-    fight = "*"
-    feed = "<"
-    pacify = "pacify"
-    for position_instruction in sorted_list_instruction:
-        if pacify in position_instruction:
-            int_list_position = manipulate_instruction(position_instruction, pacify)
-            if get_creature_nb_action(data, get_id_from_location(data, int_list_position)) == 0:
-                pacification(data, get_id_from_location(data, int_list_position))
-
-        elif fight in position_instruction:
-            int_list_new_position, int_list_old_position, sub_x, sub_y = manipulate_instruction(position_instruction,
-                                                                                                fight)
-            if get_id_from_location(data, int_list_old_position) != None:
-                if get_creature_nb_action(data, get_id_from_location(data, int_list_old_position)) == 0:
-                    if 0 < int_list_old_position[0] <= data["map"][0] and 0 < int_list_old_position[1] <= data["map"][
-                        1] and 0 < int_list_new_position[0] <= data["map"][0] and \
-                            0 < int_list_new_position[1] <= data["map"][1]:
-                        if -1 <= sub_x <= 1 and -1 <= sub_y <= 1:
-                            fight_creature(data, data_map, int_list_old_position, int_list_new_position)
-
-        elif feed in position_instruction:
-            int_list_new_position, int_list_old_position, sub_x, sub_y = manipulate_instruction(position_instruction,
-                                                                                                feed)
-            if get_id_from_location(data, int_list_old_position) != None:
-                if get_creature_nb_action(data, get_id_from_location(data, int_list_old_position)) == 0:
-                    if 0 < int_list_old_position[0] <= data["map"][0] and 0 < int_list_old_position[1] <= data["map"][
-                        1] and 0 < int_list_new_position[0] <= data["map"][0] and \
-                            0 < int_list_new_position[1] <= data["map"][1]:
-                        if -1 <= sub_x <= 1 and -1 <= sub_y <= 1:
-                            feed_creature(data, data_map, int_list_old_position, int_list_new_position)
-
-        elif move in position_instruction:
-            int_list_new_position, int_list_old_position, sub_x, sub_y = manipulate_instruction(position_instruction,
-                                                                                                move)
-            if get_id_from_location(data, int_list_old_position) != None:
-                if get_creature_nb_action(data, get_id_from_location(data, int_list_old_position)) == 0:
-                    if 0 < int_list_old_position[0] <= data["map"][0] and 0 < int_list_old_position[1] <= data["map"][
-                        1] and 0 < int_list_new_position[0] <= data["map"][0] and \
-                            0 < int_list_new_position[1] <= data["map"][1]:
-                        if -1 <= sub_x <= 1 and -1 <= sub_y <= 1:
-                            move_creature(data, data_map, int_list_old_position, int_list_new_position)
-
-
-def sort_instruction(list_instruction):
-    """This function sorts the list of instructions
+    phases = schedule_orders(data, list_instruction)
+    damages = {}
+    for phase in ORDER_PHASES:
+        start = time.perf_counter()
+        for order in phases[phase]:
+            creature_id = get_werewolf_id_from_location(data, order.src)
+            if creature_id is None or get_creature_nb_action(data, creature_id) != 0:
+                continue
+            if phase == "pacify":
+                pacification(data, creature_id)
+            elif phase == "fight":
+                fight_creature(data, data_map, order.src, order.dst, damages)
+            elif phase == "feed":
+                feed_creature(data, data_map, order.src, order.dst)
+            else:
+                move_creature(data, data_map, order.src, order.dst)
+        if phase == "fight":
+            # all the attacks of the round happen at the same time
+            apply_damages(data, damages)
+        if timings is not None:
+            timings[phase] += time.perf_counter() - start
+
+
+def schedule_orders(data, list_instruction):
+    """This function puts the valid orders of a round in the queue of their phase
     Parameter:
     ----------
-    list_instruction: a list of instructions to sort (list)
+    data: dictionary with all information (dict)
+    list_instruction: the orders of the round (list of Order)
 
     Return:
     ------
-    sorted_list_instruction: a list of sorted instructions (list)
+    phases: the orders of each phase, in the order they were given (dict of list of Order)
 
-    Version :
+    Notes:
+    ------
+    Orders going out of the map or to a cell which is not next to the werewolf are dropped.  A werewolf
+    can only receive one order per round: only the first valid order given from a cell is kept.
+    """
+    phases = {phase: [] for phase in ORDER_PHASES}
+    seen = set()
+    for order in list_instruction:
+        if order.src in seen:
+            continue
+        if order.kind != "pacify" and not (is_in_map(data, order.src) and is_in_map(data, order.dst) and
+                                           -1 <= order.src[0] - order.dst[0] <= 1 and
+                                           -1 <= order.src[1] - order.dst[1] <= 1):
+            continue
+        seen.add(order.src)
+        phases[order.kind].append(order)
+    return phases
+
+
+def is_in_map(data, location):
+    """This function checks if the given location is on the map
+    Parameters:
     -----------
-    specification: Youssef Fiher, Omar Ametjaou (v.1 22/03/2022)
-    implementation: Elie Goche (v.1 05/03/2022)
+    data: dictionary with all information (dict)
+    location: the location to check (list or tuple)
+
+    Return:
+    -------
+    in_map: True if the location is on the map (bool)
     """
-    sorted_list_instruction = []
-    for instruction in list_instruction:
-        if "pacify" in instruction:
-            sorted_list_instruction.append(instruction)
-        if "*" in instruction:
-            sorted_list_instruction.append(instruction)
-        if "<" in instruction:
-            sorted_list_instruction.append(instruction)
-        if "@" in instruction:
-            sorted_list_instruction.append(instruction)
-    return sorted_list_instruction
-
-
-def manipulate_instruction(position_instruction, symbol):
-    if symbol == "@" or symbol == "*" or symbol == "<":
-        final_position_instruction = position_instruction.replace(symbol, "")
-        list_final_position_instruction = final_position_instruction.split(":")
-        list_old_position = list_final_position_instruction[0].split("-")
-        int_list_old_position = []
-        for number in list_old_position:
-            int_list_old_position.append(int(number))
-        list_new_position = list_final_position_instruction[1].split("-")
-        int_list_new_position = []
-        for number in list_new_position:
-            int_list_new_position.append(int(number))
-        sub_x = int_list_old_position[0] - int_list_new_position[0]
-        sub_y = int_list_old_position[1] - int_list_new_position[1]
-        return int_list_new_position, int_list_old_position, sub_x, sub_y
-    else:
-        final_position_instruction = position_instruction.replace(":" + symbol, "")
-        list_position = final_position_instruction.split("-")
-        int_list_position = []
-        for number in list_position:
-            int_list_position.append(int(number))
-        return int_list_position
+    return 0 < location[0] <= data["map"][0] and 0 < location[1] <= data["map"][1]
+
+
+def parse_orders(orders):
+    """This function turns a line of orders into a list of orders
+    Parameter:
+    ----------
+    orders: orders given by a player, e.g. '3-4:@3-5 2-2:*2-3 1-1:pacify' (str)
+
+    Return:
+    ------
+    list_order: the orders of the line, in the same order (list of Order)
+
+    Notes:
+    ------
+    The whole line is read in one pass of ORDER_PATTERN, malformed orders are ignored.  Orders are
+    immutable, so the orders already met are kept in parsed_orders and shared instead of being parsed again.
+    """
+    list_order = []
+    for groups in ORDER_PATTERN.findall(orders):
+        order = parsed_orders.get(groups)
+        if order is None:
+            row, col, symbol, dst_row, dst_col = groups
+            if symbol == "":
+                order = Order("pacify", (int(row), int(col)), None)
+            else:
+                order = Order(ORDER_KINDS[symbol], (int(row), int(col)), (int(dst_row), int(dst_col)))
+            if len(parsed_orders) < 100000:
+                parsed_orders[groups] = order
+        list_order.append(order)
+    return list_order
+
+
+def format_orders(list_order):
+    """This function turns a list of orders into a line of orders, see parse_orders
+    Parameter:
+    ----------
+    list_order: the orders (list of Order)
+
+    Return:
+    ------
+    orders: the orders separated by spaces (str)
+    """
+    line = []
+    for order in list_order:
+        if order.kind == "pacify":
+            line.append("%d-%d:pacify" % order.src)
+        else:
+            line.append("%d-%d:%s%d-%d" % (order.src + (ORDER_SYMBOLS[order.kind],) + order.dst))
+    return " ".join(line)
+
+
+def pack_orders(list_order):
+    """This function encodes a list of orders in binary: a NUL byte then one ORDER_RECORD per order
+    Parameter:
+    ----------
+    list_order: the orders (list of Order)
+
+    Return:
+    ------
+    payload: the encoded orders (bytes)
+    """
+    payload = bytearray(1 + ORDER_RECORD.size * len(list_order))
+    offset = 1
+    for order in list_order:
+        dst = order.dst if order.dst is not None else (0, 0)
+        ORDER_RECORD.pack_into(payload, offset, ORDER_OPCODES[order.kind], order.src[0], order.src[1], dst[0],
+                               dst[1])
+        offset += ORDER_RECORD.size
+    return bytes(payload)
+
+
+def unpack_orders(payload):
+    """This function decodes orders encoded by pack_orders
+    Parameter:
+    ----------
+    payload: the encoded orders (bytes)
+
+    Return:
+    ------
+    list_order: the orders, in the same order (list of Order)
+
+    Notes:
+    ------
+    Records with an unknown opcode and a truncated last record are ignored, like malformed text orders.
+    """
+    end = 1 + (len(payload) - 1) // ORDER_RECORD.size * ORDER_RECORD.size
+    list_order = []
+    for record in ORDER_RECORD.iter_unpack(memoryview(payload)[1:end]):
+        order = parsed_orders.get(record)
+        if order is None:
+            opcode, row, col, dst_row, dst_col = record
+            if opcode >= len(ORDER_OPCODE_KINDS):
+                continue
+            if opcode == 0:
+                order = Order("pacify", (row, col), None)
+            else:
+                order = Order(ORDER_OPCODE_KINDS[opcode], (row, col), (dst_row, dst_col))
+            if len(parsed_orders) < 100000:
+                parsed_orders[record] = order
+        list_order.append(order)
+    return list_order
 
 
 def move_creature(data, data_map, int_list_old_position, int_list_new_position):
@@ -1065,20 +2577,21 @@ def move_creature(data, data_map, int_list_old_position, int_list_new_position):
     specification: Youssef Fiher, Omar Ametjaou (v.1 22/03/2022)
     implementation: Elie Goche, Younes Kouza (v.1 05/03/2022)
     """
-    if "w" in get_id_from_location(data, int_list_old_position):
-        creature_id = get_id_from_location(data, int_list_old_position)
-        if data_map["l" + str(int_list_old_position[0] * 2 - 1)][int_list_old_position[1] * 2 - 1] != "  ":
-            if data_map["l" + str(int_list_new_position[0] * 2 - 1)][int_list_new_position[1] * 2 - 1] not in ["W ",
-                                                                                                               "A ",
-                                                                                                               "O ",
-                                                                                                               "H "]:
-                data_map["l" + str(int_list_old_position[0] * 2 - 1)][int_list_old_position[1] * 2 - 1] = "  "
-                data["werewolves"][creature_id]["location"] = int_list_new_position
-                data["werewolves"][creature_id]["nb_action"] += 1
-                refresh_map(data, data_map)
-
-
-def fight_creature(data, data_map, int_list_ally_position, int_list_ennemi_position):
+    creature_id = get_werewolf_id_from_location(data, int_list_old_position)
+    if creature_id is not None:
+        if get_werewolf_id_from_location(data, int_list_new_position) is None:
+            data_map["l" + str(int_list_old_position[0] * 2 - 1)][int_list_old_position[1] * 2 - 1] = "  "
+            creature_type = get_creature_type(data, creature_id)
+            clear_occupancy(data, creature_id, int_list_old_position)
+            add_bonus_influence(data, creature_id, int_list_old_position, creature_type, -1)
+            data["werewolves"][creature_id]["location"] = int_list_new_position
+            set_occupancy(data, creature_id, int_list_new_position)
+            add_bonus_influence(data, creature_id, int_list_new_position, creature_type, +1)
+            data["werewolves"][creature_id]["nb_action"] += 1
+            refresh_creatures(data)
+
+
+def fight_creature(data, data_map, int_list_ally_position, int_list_ennemi_position, damages=None):
     """Make two creature fight
     parameters :
     -----------
@@ -1086,28 +2599,55 @@ def fight_creature(data, data_map, int_list_ally_position, int_list_ennemi_posit
     data_map : dicitonary with map information for each line (dict)
     int_list_ally_position : the position of the ally (list)
     int_list_enemy_position : the position of the enemy (list)
+    damages : damages of the round by werewolf id, to apply them later with apply_damages (dict, optional)
+
+    Notes :
+    -------
+    Without damages, the enemy loses its energy at once.
 
     Version :
     -----------
     specification: Youssef Fiher, Omar Ametjaou (v.1 22/03/2022)
     implementation: Elie Goche, Younes Kouza (v.1 05/03/2022)
     """
-    creature_ally_id = get_id_from_location(data, int_list_ally_position)
-    creature_ennemi_id = get_id_from_location(data, int_list_ennemi_position)
-    if data_map["l" + str(int_list_ally_position[0] * 2 - 1)][int_list_ally_position[1] * 2 - 1] not in ["  ", "a ",
-                                                                                                         "b ", "m ",
-                                                                                                         "r ", "d ",
-                                                                                                         "H "] and \
-            data_map["l" + str(int_list_ennemi_position[0] * 2 - 1)][int_list_ennemi_position[1] * 2 - 1] not in ["  ",
-                                                                                                                  "a ",
-                                                                                                                  "b ",
-                                                                                                                  "m ",
-                                                                                                                  "r ",
-                                                                                                                  "d ",
-                                                                                                                  "H "] and \
+    creature_ally_id = get_werewolf_id_from_location(data, int_list_ally_position)
+    creature_ennemi_id = get_werewolf_id_from_location(data, int_list_ennemi_position)
+    if creature_ally_id is not None and creature_ennemi_id is not None and \
+            get_creature_type(data, creature_ally_id) != "human" and \
+            get_creature_type(data, creature_ennemi_id) != "human" and \
             data["werewolves"][creature_ally_id]["pacified"] == False:
-        data['werewolves'][creature_ennemi_id]['energy'] -= get_creature_damage(data, creature_ally_id)
         data["werewolves"][creature_ally_id]["nb_action"] += 1
+        if damages is None:
+            apply_damages(data, {creature_ennemi_id: get_creature_damage(data, creature_ally_id)})
+        else:
+            damages[creature_ennemi_id] = damages.get(creature_ennemi_id, 0) + get_creature_damage(data,
+                                                                                                  creature_ally_id)
+
+
+def apply_damages(data, damages):
+    """Removes the damages of the attacks from the energy of the werewolves
+    parameters :
+    -----------
+    data : dicitonary with all information (dict)
+    damages : total damage received by each werewolf, by id (dict)
+
+    Notes :
+    -------
+    damages is emptied.
+    """
+    werewolves = data["werewolves"]
+    energy = werewolves.columns["energy"]
+    journal = werewolves.journal
+    for creature_id, damage in damages.items():
+        i = werewolves.index[creature_id]
+        if journal is not None:
+            journal_item(journal, energy, i)
+        energy[i] -= damage
+        if energy[i] <= 0:
+            if journal is not None:
+                journal_member(journal, data["fallen"], creature_id)
+            data["fallen"].add(creature_id)
+    damages.clear()
 
 
 def feed_creature(data, data_map, int_list_creature_position, int_food_position):
@@ -1125,31 +2665,23 @@ def feed_creature(data, data_map, int_list_creature_position, int_food_position)
     implementation: Youssef Fiher, Omar Ametjaou (v.1 05/03/2022)
     """
     if int_list_creature_position != int_food_position:
-        creature_id = get_id_from_location(data, int_list_creature_position)
-        food_id = get_id_from_location(data, int_food_position)
-        if data_map["l" + str(int_list_creature_position[0] * 2 - 1)][int_list_creature_position[1] * 2 - 1] not in [
-            "  ",
-            "a ",
-            "b ",
-            "m ",
-            "r ",
-            "d "] and \
-                data_map["l" + str(int_food_position[0] * 2 - 1)][int_food_position[1] * 2 - 1] not in ["  ", "O ",
-                                                                                                        "A ",
-                                                                                                        "W ",
-                                                                                                        "H "]:
+        creature_id = get_werewolf_id_from_location(data, int_list_creature_position)
+        food_id = get_food_id_from_location(data, int_food_position)
+        if creature_id is not None and food_id is not None and \
+                get_werewolf_id_from_location(data, int_food_position) is None:
             if get_object_energy(data, creature_id) < 100:
                 if get_object_energy(data, creature_id) + get_object_energy(data, food_id) <= 100:
                     data["werewolves"][creature_id]["energy"] += get_object_energy(data, food_id)
-                    data["werewolves"][creature_id]["type"] = get_creature_type_ref(data, creature_id)
+                    set_creature_type(data, creature_id, get_creature_type_ref(data, creature_id))
                     data["foods"][food_id]["energy"] = 0
                     data_map["l" + str(int_food_position[0] * 2 - 1)][int_food_position[1] * 2 - 1] = "  "
+                    clear_occupancy(data, food_id, int_food_position)
                     del data["foods"][food_id]
                     data["werewolves"][creature_id]["nb_action"] += 1
                 else:
                     data["foods"][food_id]["energy"] -= (100 - get_object_energy(data, creature_id))
                     data["werewolves"][creature_id]["energy"] = 100
-                    data["werewolves"][creature_id]["type"] = get_creature_type_ref(data, creature_id)
+                    set_creature_type(data, creature_id, get_creature_type_ref(data, creature_id))
                     data["werewolves"][creature_id]["nb_action"] += 1
 
 
@@ -1170,10 +2702,9 @@ def pacification(data, omega_id):
         if residual_energy_omega > 40:
             data['werewolves'][omega_id]['energy'] -= 40
             data["werewolves"][omega_id]["nb_action"] += 1
-            for creature_id in data['werewolves']:
+            for creature_id in within(data, get_object_location(data, omega_id), 6):
                 if get_creature_type(data, creature_id) == 'normal' or get_creature_type(data, creature_id) == 'alpha':
-                    if get_distance(data, omega_id, creature_id) <= 6:
-                        data["werewolves"][creature_id]["pacified"] = True
+                    data["werewolves"][creature_id]["pacified"] = True
 
 
 def check_if_good_team(data, instruction, team):
@@ -1181,194 +2712,283 @@ def check_if_good_team(data, instruction, team):
     Parameter:
     ----------
     data: data of all information (dictionary)
-    instruction: instruction that the player (or AI) gives (list)
+    instruction: orders that the player (or AI) gives (list of Order)
     team : team of the player (int)
 
     Return:
     -------
-    list_valid_team_instruction: a list of valid team instructions (list)
+    list_valid_team_instruction: a list of valid team orders (list of Order)
 
     Version:
     ---------
     specification: Elie Goche (v.1 28/03/2022)
     implementation: Elie Goche (v.1 25/03/2022)
     """
-    list_instruction = instruction.split(" ")
-    move = "@"
-    fight = "*"
-    feed = "<"
-    pacify = "pacify"
     list_valid_team_instruction = []
-    for position_instruction in list_instruction:
-        if pacify in position_instruction:
-            int_list_position = manipulate_instruction(position_instruction, pacify)
-            if get_id_from_location(data, int_list_position) != None:
-                if get_creature_team(data, get_id_from_location(data, int_list_position)) == team:
-                    list_valid_team_instruction.append(position_instruction)
-        elif fight in position_instruction:
-            int_list_new_position, int_list_old_position, sub_x, sub_y = manipulate_instruction(position_instruction,
-                                                                                                fight)
-            if get_id_from_location(data, int_list_old_position) != None:
-                if get_creature_team(data, get_id_from_location(data, int_list_old_position)) == team:
-                    list_valid_team_instruction.append(position_instruction)
-        elif feed in position_instruction:
-            int_list_new_position, int_list_old_position, sub_x, sub_y = manipulate_instruction(position_instruction,
-                                                                                                feed)
-            if get_id_from_location(data, int_list_old_position) != None:
-                if get_creature_team(data, get_id_from_location(data, int_list_old_position)) == team:
-                    list_valid_team_instruction.append(position_instruction)
-        elif move in position_instruction:
-            int_list_new_position, int_list_old_position, sub_x, sub_y = manipulate_instruction(position_instruction,
-                                                                                                move)
-            if get_id_from_location(data, int_list_old_position) != None:
-                if get_creature_team(data, get_id_from_location(data, int_list_old_position)) == team:
-                    list_valid_team_instruction.append(position_instruction)
+    for order in instruction:
+        creature_id = get_werewolf_id_from_location(data, order.src)
+        if creature_id is not None:
+            if get_creature_team(data, creature_id) == team:
+                list_valid_team_instruction.append(order)
     return list_valid_team_instruction
 
 
-def get_AI_orders(data, data_map, team):
-    """This function gives is the basic algorithm of the AI. The AI give randomly instructions
+def get_AI_orders(data, data_map, team, rng=random):
+    """This function gives is the basic algorithm of the AI. The AI gives one order to each werewolf of its team
+    Parameter:
+    ----------
+    data: data of all information (dictionary)
+    team : team of the player (int)
+    rng: random generator of the game, the random module by default (random.Random, optional)
+
+    Return:
+    -------
+    all_move_instruction: all move instructions gived by the AI (str)
+
+    Version:
+    ---------
+    specification: Elie Goche (v.1 28/03/2022)
+    implementation: Elie Goche (v.1 25/03/2022)
+    """
+    rosters = get_team_rosters(data)
+    list_move_instruction = []
+    if team in rosters:
+        for creature_id in rosters[team]["members"]:
+            get_AI_creature_order(data, data_map, creature_id, team, rosters, list_move_instruction, rng)
+    return " ".join(list_move_instruction)
+
+
+def get_team_rosters(data):
+    """This function returns the werewolves of each team, with their alpha and omega
+    Parameter:
+    ----------
+    data: data of all information (dictionary)
+
+    Return:
+    -------
+    rosters: for each team, the id of its alpha, of its omega (None if it became human) and of all its members (dict)
+    """
+    rosters = {}
+    for creature_id in data["werewolves"]:
+        team = get_creature_team(data, creature_id)
+        if team not in rosters:
+            rosters[team] = {"alpha": None, "omega": None, "members": []}
+        rosters[team]["members"].append(creature_id)
+        creature_type = get_creature_type(data, creature_id)
+        if creature_type in ("alpha", "omega"):
+            rosters[team][creature_type] = creature_id
+    return rosters
+
+
+def get_AI_creature_order(data, data_map, creature_id, team, rosters, list_move_instruction, rng=random):
+    """This function chooses the order of one werewolf of the AI
+    Parameter:
+    ----------
+    data: data of all information (dictionary)
+    data_map: dictionary with all information for each line in the map (dict)
+    creature_id: the id of the werewolf (str)
+    team: team of the player (int)
+    rosters: the werewolves of each team (see get_team_rosters) (dict)
+    list_move_instruction: list of instruction to be executed, where the order is added (list)
+    rng: random generator of the game, the random module by default (random.Random, optional)
+
+    Notes:
+    ------
+    Strong normals and omegas stay around their alpha while the alphas are far from each other and go to the
+    enemy alpha when they are close, weak ones go to eat.  The omega pacifies when its alpha is weak.  Humans
+    go to eat or run away from their alpha.  A strong alpha keeps a distance of 4 to 5 from the enemy alpha,
+    a weak one goes to eat.
+    """
+    alpha_id = rosters[team]["alpha"]
+    enemy_alpha_id = None
+    for other_team in rosters:
+        if other_team != team and rosters[other_team]["alpha"] is not None:
+            enemy_alpha_id = rosters[other_team]["alpha"]
+    creature_location = get_object_location(data, creature_id)
+    creature_type = get_creature_type(data, creature_id)
+    energy = get_object_energy(data, creature_id)
+
+    if creature_type == "omega" and alpha_id is not None and get_object_energy(data, alpha_id) < 50 and energy > 40:
+        object1_to_object2(data, data_map, creature_location, None, list_move_instruction, "pacify")
+
+    elif creature_type in ["normal", "omega"]:
+        if energy >= 30:
+            if alpha_id is not None and enemy_alpha_id is not None and get_distance(data, alpha_id,
+                                                                                    enemy_alpha_id) > 5:
+                alpha_location = get_object_location(data, alpha_id)
+                if get_distance(data, creature_id, alpha_id) > 2:
+                    object1_to_object2(data, data_map, creature_location, alpha_location, list_move_instruction, "@",
+                                       rng)
+                else:
+                    object1_move_reverse_to_object2(data, data_map, creature_location, alpha_location,
+                                                    list_move_instruction, rng)
+            elif not AI_attack(data, data_map, creature_id, creature_location, team, list_move_instruction):
+                if enemy_alpha_id is not None:
+                    object1_to_object2(data, data_map, creature_location, get_object_location(data, enemy_alpha_id),
+                                       list_move_instruction, "@", rng)
+        elif not AI_eat(data, data_map, creature_id, creature_location, list_move_instruction, rng):
+            AI_attack(data, data_map, creature_id, creature_location, team, list_move_instruction)
+
+    elif creature_type == "human":
+        if not AI_eat(data, data_map, creature_id, creature_location, list_move_instruction, rng):
+            if alpha_id is not None:
+                object1_move_reverse_to_object2(data, data_map, creature_location,
+                                                get_object_location(data, alpha_id), list_move_instruction, rng)
+
+    elif energy >= 50:
+        if enemy_alpha_id is not None:
+            enemy_alpha_location = get_object_location(data, enemy_alpha_id)
+            distance = get_distance(data, creature_id, enemy_alpha_id)
+            if distance > 5:
+                object1_to_object2(data, data_map, creature_location, enemy_alpha_location, list_move_instruction,
+                                   "@", rng)
+            elif distance < 4:
+                object1_move_reverse_to_object2(data, data_map, creature_location, enemy_alpha_location,
+                                                list_move_instruction, rng)
+            else:
+                AI_attack(data, data_map, creature_id, creature_location, team, list_move_instruction)
+
+    elif not AI_eat(data, data_map, creature_id, creature_location, list_move_instruction, rng):
+        if enemy_alpha_id is not None:
+            object1_to_object2(data, data_map, creature_location, get_object_location(data, enemy_alpha_id),
+                               list_move_instruction, "@", rng)
+
+
+def AI_eat(data, data_map, creature_id, creature_location, list_move_instruction, rng=random):
+    """This function makes a werewolf of the AI go to the nearest food and eat it
+    Parameter:
+    ----------
+    data: data of all information (dictionary)
+    data_map: dictionary with all information for each line in the map (dict)
+    creature_id: the id of the werewolf (str)
+    creature_location: the location of the werewolf (list)
+    list_move_instruction: list of instruction to be executed, where the order is added (list)
+    rng: random generator of the game, the random module by default (random.Random, optional)
+
+    Return:
+    -------
+    ordered: False if there is no food left (bool)
+
+    Notes:
+    ------
+    A werewolf next to a food eats the nearest one.  The others take one step on the distance field of the
+    nearest food (see get_distance_field), shared by all the hungry werewolves of the round.
+    """
+    food_id = get_nearest_food(data, creature_location)
+    if food_id is None:
+        return False
+    food_location = get_object_location(data, food_id)
+    if get_distance(data, creature_id, food_id) > 1:
+        step = get_next_step(data, None, creature_location)
+        if step is not None:
+            list_move_instruction.append(str(creature_location[0]) + "-" + str(creature_location[1]) + ":@" +
+                                         str(step[0]) + "-" + str(step[1]))
+        else:
+            list_move_instruction.append(AI_move_direction(data, data_map, creature_location,
+                                                           get_sign(food_location[0] - creature_location[0]),
+                                                           get_sign(food_location[1] - creature_location[1]), 5,
+                                                           rng))
+    else:
+        object1_to_object2(data, data_map, creature_location, food_location, list_move_instruction, "<", rng)
+    return True
+
+
+def AI_attack(data, data_map, creature_id, creature_location, team, list_move_instruction):
+    """This function makes a werewolf of the AI attack the weakest enemy next to it
+    Parameter:
+    ----------
+    data: data of all information (dictionary)
+    data_map: dictionary with all information for each line in the map (dict)
+    creature_id: the id of the werewolf (str)
+    creature_location: the location of the werewolf (list)
+    team: team of the player (int)
+    list_move_instruction: list of instruction to be executed, where the order is added (list)
+
+    Return:
+    -------
+    ordered: False if there is no enemy werewolf next to it (bool)
+    """
+    target_id = None
+    # within gives the nearest first: the enemies are looked at in the order of their ids, as the rules always did
+    for creature_enemy_id in sorted(within(data, creature_location, 1), key=data["werewolves"].index.__getitem__):
+        if get_creature_team(data, creature_enemy_id) != team and get_creature_type(data, creature_enemy_id) != "human":
+            if target_id is None or get_object_energy(data, creature_enemy_id) < get_object_energy(data, target_id):
+                target_id = creature_enemy_id
+    if target_id is None:
+        return False
+    object1_to_object2(data, data_map, creature_location, get_object_location(data, target_id),
+                       list_move_instruction, "*")
+    return True
+
+
+def get_nearest_food(data, location):
+    """This function returns the nearest food of a location
     Parameter:
     ----------
     data: data of all information (dictionary)
-    team : team of the player (int)
+    location: the location (list)
 
     Return:
     -------
-    all_move_instruction[:-1]: all move instructions gived by the AI (str)
+    food_id: the id of the nearest food (the first one given by the map when several are at the same distance),
+             None if there is no food left (str)
 
-    Version:
-    ---------
-    specification: Elie Goche (v.1 28/03/2022)
-    implementation: Elie Goche (v.1 25/03/2022)
+    Notes:
+    ------
+    The buckets of foods are looked at ring by ring around the bucket of the location, until the next ring
+    cannot hold a nearer food.
     """
-    list_move_instruction = []
-    for creature_id in data["werewolves"]:
-        if get_creature_team(data, creature_id) == team:
-            creature_location = get_object_location(data, creature_id)
-            if get_creature_type(data, creature_id) in ["normal", "omega"]:
-                if get_object_energy(data, creature_id) >= 30:
-                    for alpha_id in data["werewolves"]:
-                        if get_creature_team(data, alpha_id) == team and get_creature_type(data, alpha_id) == "alpha":
-                            alpha_location = get_object_location(data, alpha_id)
-                            for alpha_team2_id in data["werewolves"]:
-                                if get_creature_team(data, alpha_team2_id) != team and get_creature_type(data,
-                                                                                                         alpha_team2_id) == "alpha":
-                                    alpha_team2_location = get_object_location(data, alpha_team2_id)
-                                    if get_distance(data, alpha_id, alpha_team2_id) > 5:
-                                        if get_distance(data, creature_id, alpha_id) > 2:
-                                            object1_to_object2(data, data_map, creature_location, alpha_location,
-                                                               list_move_instruction, "@")
-                                        elif get_distance(data, creature_id, alpha_id) < 3:
-                                            object1_move_reverse_to_object2(data, data_map, creature_location,
-                                                                            alpha_location, list_move_instruction)
-                                        else:
-                                            for creature_enemy_id in data["werewolves"]:
-                                                if get_creature_team(data, creature_enemy_id) != team:
-                                                    if get_distance(data, creature_id, creature_enemy_id) == 1:
-                                                        creature_enemy_location = get_object_location(data,
-                                                                                                      creature_enemy_id)
-                                                        object1_to_object2(data, data_map, creature_location,
-                                                                           creature_enemy_location,
-                                                                           list_move_instruction, "*")
-
-                                    else:
-                                        for creature_enemy_id in data["werewolves"]:
-                                            if get_creature_team(data, creature_enemy_id) != team:
-                                                if get_distance(data, creature_id, creature_enemy_id) == 1:
-                                                    creature_enemy_location = get_object_location(data,
-                                                                                                  creature_enemy_id)
-                                                    object1_to_object2(data, data_map, creature_location,
-                                                                       creature_enemy_location, list_move_instruction,
-                                                                       "*")
-                                        object1_to_object2(data, data_map, creature_location, alpha_team2_location,
-                                                           list_move_instruction, "@")
-
-                else:
-                    if data["foods"] != {}:
-                        for food_id in data["foods"]:
-                            food_location = get_object_location(data, food_id)
-                            if get_distance(data, creature_id, food_id) > 1:
-                                object1_to_object2(data, data_map, creature_location, food_location,
-                                                   list_move_instruction, "@")
-                            else:
-                                object1_to_object2(data, data_map, creature_location, food_location,
-                                                   list_move_instruction, "<")
+    buckets = data["food_buckets"]
+    if len(buckets) == 0:
+        return None
+    foods = data["foods"]
+    row, col = location[0], location[1]
+    bucket_row, bucket_col = row // FOOD_BUCKET_SIZE, col // FOOD_BUCKET_SIZE
+    max_ring = max(data["map"]) // FOOD_BUCKET_SIZE + 1
+    nearest = None
+    for ring in range(max_ring + 1):
+        for ring_row in range(bucket_row - ring, bucket_row + ring + 1):
+            for ring_col in range(bucket_col - ring, bucket_col + ring + 1):
+                if max(abs(ring_row - bucket_row), abs(ring_col - bucket_col)) == ring:
+                    for food_id, (food_row, food_col) in buckets.get((ring_row, ring_col), {}).items():
+                        candidate = (max(abs(food_row - row), abs(food_col - col)), foods.index[food_id], food_id)
+                        if nearest is None or candidate < nearest:
+                            nearest = candidate
+        # the foods of the next ring are at a distance greater than ring * FOOD_BUCKET_SIZE
+        if nearest is not None and nearest[0] <= ring * FOOD_BUCKET_SIZE:
+            break
+    if nearest is None:
+        return None
+    return nearest[2]
+
+
+def get_foods_within(data, location, radius):
+    """This function returns the foods at the given distance or less from a location
+    Parameter:
+    ----------
+    data: data of all information (dictionary)
+    location: the location (list)
+    radius: the maximum distance (int)
 
-                    else:
-                        for creature_enemy_id in data["werewolves"]:
-                            if get_creature_team(data, creature_enemy_id) != team:
-                                if get_distance(data, creature_id, creature_enemy_id) == 1:
-                                    creature_enemy_location = get_object_location(data, creature_enemy_id)
-                                    object1_to_object2(data, data_map, creature_location,
-                                                       creature_enemy_location, list_move_instruction, "*")
-
-
-            elif get_creature_type(data, creature_id) == "human":
-                if data["foods"] == {}:
-                    for alpha_id in data["werewolves"]:
-                        if get_creature_team(data, alpha_id) == team and get_creature_type(data, alpha_id) == "alpha":
-                            alpha_location = get_object_location(data, alpha_id)
-                            object1_move_reverse_to_object2(data, data_map, creature_location, alpha_location,
-                                                            list_move_instruction)
-                else:
-                    for food_id in data["foods"]:
-                        food_location = get_object_location(data, food_id)
-                        if get_distance(data, creature_id, food_id) > 1:
-                            object1_to_object2(data, data_map, creature_location, food_location,
-                                               list_move_instruction, "@")
-                        else:
-                            object1_to_object2(data, data_map, creature_location, food_location,
-                                               list_move_instruction, "<")
-            else:
-                if get_object_energy(data, creature_id) >= 50:
-                    for alpha_team2_id in data["werewolves"]:
-                        if get_creature_team(data, alpha_team2_id) != team and get_creature_type(data,
-                                                                                                 alpha_team2_id) == "alpha":
-                            alpha_team2_location = get_object_location(data, alpha_team2_id)
-                            if get_distance(data, creature_id, alpha_team2_id) > 5:
-                                object1_to_object2(data, data_map, creature_location, alpha_team2_location,
-                                                   list_move_instruction, "@")
-                            elif get_distance(data, creature_id, alpha_team2_id) < 4:
-                                object1_move_reverse_to_object2(data, data_map, creature_location, alpha_team2_location,
-                                                                list_move_instruction)
-                            else:
-                                for creature_enemy_id in data["werewolves"]:
-                                    if get_creature_team(data, creature_enemy_id) != team:
-                                        if get_distance(data, creature_id, creature_enemy_id) == 1:
-                                            creature_enemy_location = get_object_location(data, creature_enemy_id)
-                                            object1_to_object2(data, data_map, creature_location,
-                                                               creature_enemy_location, list_move_instruction, "*")
-                else:
-                    for omega_id in data["werewolves"]:
-                        if get_creature_team(data, omega_id) == team and get_creature_type(data, omega_id) == "omega":
-                            omega_location = get_object_location(data, omega_id)
-                            object1_to_object2(data, data_map, omega_location, None, list_move_instruction, "pacify")
-
-                    if data["foods"] == {}:
-                        for alpha_team2_id in data["werewolves"]:
-                            if get_creature_team(data, alpha_team2_id) != team and get_creature_type(data,
-                                                                                                     alpha_team2_id) == "alpha":
-                                alpha_team2_location = get_object_location(data, alpha_team2_id)
-                                object1_to_object2(data, data_map, creature_location,
-                                                   alpha_team2_location, list_move_instruction, "@")
-                    else:
-                        for food_id in data["foods"]:
-                            food_location = get_object_location(data, food_id)
-                            if get_distance(data, creature_id, food_id) > 1:
-                                object1_to_object2(data, data_map, creature_location, food_location,
-                                                   list_move_instruction, "@")
-                            else:
-                                object1_to_object2(data, data_map, creature_location, food_location,
-                                                   list_move_instruction, "<")
-
-    all_move_instruction = ""
-    for move_instruction in list_move_instruction:
-        all_move_instruction += move_instruction + " "
-    return all_move_instruction[:-1]
-
-
-def object1_to_object2(data, data_map, object1_location, object2location, list_move_instruction, action):
+    Return:
+    -------
+    food_ids: the id of the foods, from the nearest to the farthest (list)
+    """
+    buckets = data["food_buckets"]
+    foods = data["foods"]
+    row, col = location[0], location[1]
+    found = []
+    for bucket_row in range((row - radius) // FOOD_BUCKET_SIZE, (row + radius) // FOOD_BUCKET_SIZE + 1):
+        for bucket_col in range((col - radius) // FOOD_BUCKET_SIZE, (col + radius) // FOOD_BUCKET_SIZE + 1):
+            for food_id, (food_row, food_col) in buckets.get((bucket_row, bucket_col), {}).items():
+                distance = max(abs(food_row - row), abs(food_col - col))
+                if distance <= radius:
+                    found.append((distance, foods.index[food_id], food_id))
+    found.sort()
+    return [food_id for distance, index, food_id in found]
+
+
+def object1_to_object2(data, data_map, object1_location, object2location, list_move_instruction, action, rng=random):
     """This function  of AI. makes the wolve moves into the direction of an other object 
     Parameter:
     ----------
@@ -1378,52 +2998,23 @@ def object1_to_object2(data, data_map, object1_location, object2location, list_m
     object2location: the location of the second object (list)
     list_move_instruction: list of instruction to be executed (list)
     action: move or attack or feed or pacify(str) 
+    rng: random generator used when no free cell leads to the other object (random.Random, optional)
     version :
     ---------
     specification: Youssef Fiher,Omar Ametjaou
     implementation:Youssef Fiher,Omar Ametjaou, Elie Goche 
     """
     if action == "@":
-        # move down-right
-        if object1_location[0] < object2location[0] and object1_location[1] < \
-                object2location[1]:
-            order = AI_move_direction(data, data_map, object1_location, +1, +1, 5)
-            list_move_instruction.append(order)
-        # move top-left
-        elif object1_location[0] > object2location[0] and object1_location[1] > \
-                object2location[1]:
-            order = AI_move_direction(data, data_map, object1_location, -1, -1, 5)
-            list_move_instruction.append(order)
-        # move down-left
-        elif object1_location[0] < object2location[0] and object1_location[1] > \
-                object2location[1]:
-            order = AI_move_direction(data, data_map, object1_location, +1, -1, 5)
-            list_move_instruction.append(order)
-        # move top-right
-        elif object1_location[0] > object2location[0] and object1_location[1] < \
-                object2location[1]:
-            order = AI_move_direction(data, data_map, object1_location, -1, +1, 5)
-            list_move_instruction.append(order)
-        # move-right
-        elif object1_location[0] == object2location[0] and object1_location[1] < \
-                object2location[1]:
-            order = AI_move_direction(data, data_map, object1_location, 0, +1, 5)
-            list_move_instruction.append(order)
-        # move left
-        elif object1_location[0] == object2location[0] and object1_location[1] > \
-                object2location[1]:
-            order = AI_move_direction(data, data_map, object1_location, 0, -1, 5)
-            list_move_instruction.append(order)
-        # move down
-        elif object1_location[0] < object2location[0] and object1_location[1] == \
-                object2location[1]:
-            order = AI_move_direction(data, data_map, object1_location, +1, 0, 5)
-            list_move_instruction.append(order)
-        # move top
-        elif object1_location[0] > object2location[0] and object1_location[1] == \
-                object2location[1]:
-            order = AI_move_direction(data, data_map, object1_location, -1, 0, 5)
-            list_move_instruction.append(order)
+        if object1_location != object2location:
+            step = get_next_step(data, object2location, object1_location)
+            if step is not None:
+                list_move_instruction.append(str(object1_location[0]) + "-" + str(object1_location[1]) + ":@" +
+                                             str(step[0]) + "-" + str(step[1]))
+            else:
+                order = AI_move_direction(data, data_map, object1_location,
+                                          get_sign(object2location[0] - object1_location[0]),
+                                          get_sign(object2location[1] - object1_location[1]), 5, rng)
+                list_move_instruction.append(order)
     elif action == "*":
         list_move_instruction.append(
             str(object1_location[0]) + "-" + str(
@@ -1438,7 +3029,8 @@ def object1_to_object2(data, data_map, object1_location, object2location, list_m
         list_move_instruction.append(str(object1_location[0]) + "-" + str(object1_location[1]) + ":pacify")
 
 
-def object1_move_reverse_to_object2(data, data_map, object1_location, object2location, list_move_instruction):
+def object1_move_reverse_to_object2(data, data_map, object1_location, object2location, list_move_instruction,
+                                    rng=random):
     """This function  of AI. makes the wolve moves into the opposite direction of the other object 
     Parameter:
     ----------
@@ -1447,67 +3039,157 @@ def object1_move_reverse_to_object2(data, data_map, object1_location, object2loc
     object1_location: the location of the first object (list)
     object2location: the location of the second object (list)
     list_move_instruction: list of instruction to be executed (list)
+    rng: random generator used when no free cell leads away from the other object (random.Random, optional)
     Version :
     ---------
     specification: Youssef Fiher,Omar Ametjaou
     implementation:Youssef Fiher,Omar Ametjaou, Elie Goche 
     
     """
-    # move down-right
-    if object1_location[0] > object2location[0] and object1_location[1] > \
-            object2location[1]:
-        order = AI_move_direction(data, data_map, object1_location, +1, +1, 5)
-        list_move_instruction.append(order)
-    # move top-left
-    elif object1_location[0] < object2location[0] and object1_location[1] < \
-            object2location[1]:
-        order = AI_move_direction(data, data_map, object1_location, -1, -1, 5)
-        list_move_instruction.append(order)
-    # move down-left
-    elif object1_location[0] > object2location[0] and object1_location[1] < \
-            object2location[1]:
-        order = AI_move_direction(data, data_map, object1_location, +1, -1, 5)
-        list_move_instruction.append(order)
-    # move top-right
-    elif object1_location[0] < object2location[0] and object1_location[1] > \
-            object2location[1]:
-        order = AI_move_direction(data, data_map, object1_location, -1, +1, 5)
-        list_move_instruction.append(order)
-    # move-right
-    elif object1_location[0] == object2location[0] and object1_location[1] > \
-            object2location[1]:
-        order = AI_move_direction(data, data_map, object1_location, 0, +1, 5)
-        list_move_instruction.append(order)
-    # move left
-    elif object1_location[0] == object2location[0] and object1_location[1] < \
-            object2location[1]:
-        order = AI_move_direction(data, data_map, object1_location, 0, -1, 5)
-        list_move_instruction.append(order)
-    # move down
-    elif object1_location[0] > object2location[0] and object1_location[1] == \
-            object2location[1]:
-        order = AI_move_direction(data, data_map, object1_location, +1, 0, 5)
-        list_move_instruction.append(order)
-    # move top
-    elif object1_location[0] < object2location[0] and object1_location[1] == \
-            object2location[1]:
-        order = AI_move_direction(data, data_map, object1_location, -1, 0, 5)
-        list_move_instruction.append(order)
-
-
-def AI_move_direction(data, data_map, location, y_move, x_move, nb_retry):
+    if object1_location != object2location:
+        step = get_next_step(data, object2location, object1_location, away=True)
+        if step is not None:
+            list_move_instruction.append(str(object1_location[0]) + "-" + str(object1_location[1]) + ":@" +
+                                         str(step[0]) + "-" + str(step[1]))
+        else:
+            order = AI_move_direction(data, data_map, object1_location,
+                                      get_sign(object1_location[0] - object2location[0]),
+                                      get_sign(object1_location[1] - object2location[1]), 5, rng)
+            list_move_instruction.append(order)
+
+
+def get_sign(number):
+    """Returns -1, 0 or +1 depending on the sign of the given number
+    Parameter:
+    ----------
+    number: the number (int)
+
+    Return:
+    -------
+    sign: the sign of the number (int)
+    """
+    if number > 0:
+        return 1
+    elif number < 0:
+        return -1
+    return 0
+
+
+def get_distance_field(data, target):
+    """This function returns the number of moves needed to reach a target from each cell of the map
+    Parameter:
+    ----------
+    data: data of all information (dictionary)
+    target: the location to reach, None to reach the nearest food (list)
+
+    Return:
+    -------
+    field: number of moves from each cell, -1 if the target cannot be reached, the cell (row, column)
+           being at index (row - 1) * number of columns + column - 1 (array)
+
+    Notes:
+    ------
+    The field is computed with a breadth-first search from the target (from all the foods at once for the
+    nearest food), werewolves being obstacles.  It is kept in data["distance_fields"] and shared by all
+    creatures going to the same target until a werewolf moves (set_occupancy and clear_occupancy forget all
+    fields, and the field of the foods when a food disappears).  At most MAX_DISTANCE_FIELDS fields are
+    kept, the oldest one being forgotten first.
+    """
+    key = None if target is None else (target[0], target[1])
+    fields = data["distance_fields"]
+    field = fields.get(key)
+    if field is None:
+        nb_rows, nb_cols = data["map"]
+        adjacency = get_adjacency(data["map"])
+        blocked = bytearray(nb_rows * nb_cols)
+        for row, col in data["occupancy"]["werewolves"]:
+            blocked[(row - 1) * nb_cols + col - 1] = 1
+        field = array('i', [-1]) * (nb_rows * nb_cols)
+        if key is None:
+            queue = [(row - 1) * nb_cols + col - 1 for row, col in data["occupancy"]["foods"]]
+        else:
+            queue = [(key[0] - 1) * nb_cols + key[1] - 1]
+        for start in queue:
+            field[start] = 0
+        for i in queue:
+            distance = field[i] + 1
+            for j in adjacency[i]:
+                if field[j] == -1 and not blocked[j]:
+                    field[j] = distance
+                    queue.append(j)
+        if len(fields) >= MAX_DISTANCE_FIELDS:
+            del fields[next(iter(fields))]
+        fields[key] = field
+    return field
+
+
+def get_adjacency(map_size):
+    """This function returns the cells next to each cell of a map, computed once for each size of map
+    Parameter:
+    ----------
+    map_size: number of rows and columns of the map (list)
+
+    Return:
+    -------
+    adjacency: index of the cells next to each cell, cells being numbered as in get_distance_field (list)
+    """
+    nb_rows, nb_cols = map_size
+    adjacency = adjacencies.get((nb_rows, nb_cols))
+    if adjacency is None:
+        adjacency = []
+        for row in range(1, nb_rows + 1):
+            for col in range(1, nb_cols + 1):
+                adjacency.append([(next_row - 1) * nb_cols + next_col - 1
+                                  for next_row in range(max(1, row - 1), min(nb_rows, row + 1) + 1)
+                                  for next_col in range(max(1, col - 1), min(nb_cols, col + 1) + 1)
+                                  if (next_row, next_col) != (row, col)])
+        adjacencies[(nb_rows, nb_cols)] = adjacency
+    return adjacency
+
+
+def get_next_step(data, target, location, away=False):
+    """This function returns the best free cell next to a location to go to (or away from) a target
+    Parameter:
+    ----------
+    data: data of all information (dictionary)
+    target: the location of the target, None to go to the nearest food (list)
+    location: the location of the creature (list)
+    away: True to go away from the target (bool, optional)
+
+    Return:
+    -------
+    step: the location of the next cell, None if no free cell leads to the target (list)
+    """
+    field = get_distance_field(data, target)
+    nb_rows, nb_cols = data["map"]
+    blocked = data["occupancy"]["werewolves"]
+    step = None
+    best_distance = None
+    for d_row, d_col in get_neighbourhood(1):
+        row = location[0] + d_row
+        col = location[1] + d_col
+        if (d_row, d_col) != (0, 0) and 0 < row <= nb_rows and 0 < col <= nb_cols and (row, col) not in blocked:
+            distance = field[(row - 1) * nb_cols + col - 1]
+            if distance != -1 and (best_distance is None or (distance > best_distance if away
+                                                             else distance < best_distance)):
+                step = [row, col]
+                best_distance = distance
+    return step
+
+
+def AI_move_direction(data, data_map, location, y_move, x_move, nb_retry, rng=random):
     if nb_retry == 0:
         return str(location[0]) + "-" + str(location[1]) + ":@" + str(location[0] + y_move) + "-" + str(
             location[1] + x_move)
     else:
-        if data_map["l" + str(check_out_of_map(data, 1, location[0] + y_move) * 2 - 1)][
-            check_out_of_map(data, 0, location[1] + x_move) * 2 - 1] == "  ":
+        if get_id_from_location(data, [check_out_of_map(data, 1, location[0] + y_move),
+                                       check_out_of_map(data, 0, location[1] + x_move)]) is None:
             return str(location[0]) + "-" + str(location[1]) + ":@" + str(location[0] + y_move) + "-" + str(
                 location[1] + x_move)
         else:
-            y_move = random.randint(-1, 1)
-            x_move = random.randint(-1, 1)
-            return AI_move_direction(data, data_map, location, y_move, x_move, nb_retry - 1)
+            y_move = rng.randint(-1, 1)
+            x_move = rng.randint(-1, 1)
+            return AI_move_direction(data, data_map, location, y_move, x_move, nb_retry - 1, rng)
 
 
 def check_out_of_map(data, x_y, number):
@@ -1519,8 +3201,690 @@ def check_out_of_map(data, x_y, number):
         return number
 
 
+def get_MCTS_orders(game, team, budget=None, nb_workers=None):
+    """This function chooses the orders of a team with a Monte Carlo tree search
+    Parameters:
+    ----------
+    game: state of the game (dict)
+    team: team of the player (int)
+    budget: time given to the search in seconds, MCTS_TIME_BUDGET by default (float, optional)
+    nb_workers: number of processes searching at the same time, MCTS_WORKERS by default (all the cores if it
+                is None) (int, optional)
+
+    Return:
+    ------
+    orders: the orders of the best candidate (str)
+
+    Notes:
+    ------
+    The candidates are lines of orders for the whole team (see get_MCTS_candidates).  With several workers,
+    each one searches from a snapshot of the game with its own random generator (root parallelization) and
+    the visits of the candidates are summed.  The number of rollouts and the time spent are added to
+    game["mcts_stats"][team].
+    """
+    if budget is None:
+        budget = MCTS_TIME_BUDGET
+    if nb_workers is None:
+        nb_workers = MCTS_WORKERS or os.cpu_count() or 1
+    start = time.perf_counter()
+    candidates = get_MCTS_candidates(game["data"], game["data_map"], team, game["rng"])
+    seeds = [game["rng"].randrange(2 ** 32) for worker in range(nb_workers)]
+
+    if nb_workers == 1:
+        results = [run_MCTS(clone_game(game), team, candidates, budget, random.Random(seeds[0]))]
+    else:
+        if "mcts_executor" not in game:
+            game["mcts_executor"] = ProcessPoolExecutor(max_workers=nb_workers)
+        snapshot = dump_snapshot(game)
+        results = list(game["mcts_executor"].map(run_MCTS_worker, [snapshot] * nb_workers, [team] * nb_workers,
+                                                 [candidates] * nb_workers, [budget] * nb_workers, seeds))
+
+    visits = [sum(result[0][i] for result in results) for i in range(len(candidates))]
+    values = [sum(result[1][i] for result in results) for i in range(len(candidates))]
+    best = max(range(len(candidates)), key=lambda i: (visits[i], values[i] / visits[i] if visits[i] else 0))
+
+    stats = game.setdefault("mcts_stats", {}).setdefault(team, {"rollouts": 0, "time": 0.0})
+    stats["rollouts"] += sum(result[2] for result in results)
+    stats["time"] += time.perf_counter() - start
+    return candidates[best]
+
+
+def run_MCTS_worker(snapshot, team, candidates, budget, seed):
+    """Runs a search in a worker process from a snapshot of the game, see run_MCTS
+    Parameters:
+    ----------
+    snapshot: snapshot of the game (bytes)
+    team: team of the player (int)
+    candidates: orders of the team to choose from (list of str)
+    budget: time given to the search in seconds (float)
+    seed: seed of the random generator of the search (int)
+
+    Return:
+    ------
+    result: visits and values of each candidate and number of rollouts (tuple)
+    """
+    return run_MCTS(load_snapshot(snapshot), team, candidates, budget, random.Random(seed))
+
+
+def run_MCTS(game, team, candidates, budget, rng):
+    """Searches the best candidate with a Monte Carlo tree search on a copy of the game
+    Parameters:
+    ----------
+    game: copy of the state of the game, changed during the search and put back at the end (dict)
+    team: team of the player (int)
+    candidates: orders of the team to choose from (list of str)
+    budget: time given to the search in seconds (float)
+    rng: random generator of the search (random.Random)
+
+    Return:
+    ------
+    result: visits and total value of each candidate and number of rollouts (tuple)
+
+    Notes:
+    ------
+    Each rollout chooses a candidate with UCB1 at each node of the tree, down to MCTS_MAX_DEPTH rounds,
+    while the enemy plays the orders of get_AI_orders.  A node visited once gets its own candidates.  Then
+    both teams play get_AI_orders for MCTS_ROLLOUT_DEPTH rounds and the state is evaluated (see
+    get_MCTS_value).  All the changes are undone with the journal of the game before the next rollout.
+    """
+    deadline = time.perf_counter() + budget
+    data = game["data"]
+    start_journal(data)
+    root = {"orders": None, "visits": 0, "value": 0.0, "children": [new_MCTS_node(orders) for orders in candidates]}
+    nb_rollouts = 0
+    while nb_rollouts == 0 or time.perf_counter() < deadline:
+        mark = journal_mark(data)
+        path = [root]
+        node = root
+        while node["children"] is not None and not game["game_over"] and len(path) <= MCTS_MAX_DEPTH:
+            node = select_MCTS_child(node)
+            path.append(node)
+            play_MCTS_round(game, team, node["orders"], rng)
+            if node["children"] is None and node["visits"] > 0 and not game["game_over"]:
+                node["children"] = [new_MCTS_node(orders) for orders in
+                                    get_MCTS_candidates(data, game["data_map"], team, rng)]
+
+        for depth in range(MCTS_ROLLOUT_DEPTH):
+            if game["game_over"]:
+                break
+            play_MCTS_round(game, team, get_AI_orders(data, game["data_map"], team, rng), rng)
+
+        value = get_MCTS_value(game, team)
+        for node in path:
+            node["visits"] += 1
+            node["value"] += value
+        undo_journal(data, mark)
+        nb_rollouts += 1
+    stop_journal(data)
+
+    return ([child["visits"] for child in root["children"]], [child["value"] for child in root["children"]],
+            nb_rollouts)
+
+
+def new_MCTS_node(orders):
+    """Returns a node of the search tree, not visited yet
+    Parameters:
+    ----------
+    orders: the orders of the team leading to the node (str)
+
+    Return:
+    ------
+    node: the orders, the number of visits, the total value and the children of the node (dict)
+    """
+    return {"orders": orders, "visits": 0, "value": 0.0, "children": None}
+
+
+def select_MCTS_child(node):
+    """Returns the child of a node to explore, with the UCB1 formula
+    Parameters:
+    ----------
+    node: the node (dict)
+
+    Return:
+    ------
+    child: the child never visited first, else the one with the best mean value plus exploration bonus (dict)
+    """
+    log_visits = math.log(max(node["visits"], 1))
+    best = None
+    best_score = None
+    for child in node["children"]:
+        if child["visits"] == 0:
+            return child
+        score = child["value"] / child["visits"] + MCTS_EXPLORATION * math.sqrt(log_visits / child["visits"])
+        if best is None or score > best_score:
+            best = child
+            best_score = score
+    return best
+
+
+def play_MCTS_round(game, team, orders, rng):
+    """Plays the current round of a copy of the game with the given orders and starts the next one
+    Parameters:
+    ----------
+    game: copy of the state of the game (dict)
+    team: team of the player (int)
+    orders: orders of the player (str)
+    rng: random generator of the search (random.Random)
+    """
+    enemy_orders = get_AI_orders(game["data"], game["data_map"], 3 - team, rng)
+    if team == 1:
+        play_round(game, orders, enemy_orders)
+    else:
+        play_round(game, enemy_orders, orders)
+    begin_round(game)
+
+
+def get_MCTS_value(game, team):
+    """Returns how good the state of a game is for a team, between 0 and 1
+    Parameters:
+    ----------
+    game: state of the game (dict)
+    team: the team (int)
+
+    Return:
+    ------
+    value: 1 for a win, 0 for a loss, 0.5 for an egality, else a value growing with the energy of the team
+           and of its alpha compared with the enemy (float)
+    """
+    if game["game_over"]:
+        if game["winner"] == team:
+            return 1.0
+        return 0.5 if game["winner"] == 0 else 0.0
+    data = game["data"]
+    rosters = get_team_rosters(data)
+    score = get_team_energy(data, team) - get_team_energy(data, 3 - team)
+    for roster_team, sign in ((team, 1), (3 - team, -1)):
+        if roster_team in rosters and rosters[roster_team]["alpha"] is not None:
+            score += sign * 2 * get_object_energy(data, rosters[roster_team]["alpha"])
+    return 0.5 + 0.5 * math.tanh(score / 300)
+
+
+def get_MCTS_candidates(data, data_map, team, rng):
+    """This function returns the lines of orders of a team among which the search chooses
+    Parameters:
+    ----------
+    data: data of all information (dictionary)
+    data_map: dictionary with all information for each line in the map (dict)
+    team: team of the player (int)
+    rng: random generator (random.Random)
+
+    Return:
+    ------
+    candidates: the orders of get_AI_orders, of an all-out attack, of a feeding round, then of
+                MCTS_NB_CANDIDATES - 3 changes of the orders of get_AI_orders (list of str)
+
+    Notes:
+    ------
+    In an all-out attack, the werewolves fight an enemy next to them or go to the enemy alpha.  In a
+    feeding round, they eat or go to the nearest food.  The changes give a random order (a move to a cell
+    next to the werewolf or an attack of an enemy next to it) to some werewolves.
+    """
+    rosters = get_team_rosters(data)
+    if team not in rosters:
+        return [""]
+    members = rosters[team]["members"]
+    enemy_alpha_id = None
+    for other_team in rosters:
+        if other_team != team and rosters[other_team]["alpha"] is not None:
+            enemy_alpha_id = rosters[other_team]["alpha"]
+
+    rule_orders = {}
+    for creature_id in members:
+        list_move_instruction = []
+        get_AI_creature_order(data, data_map, creature_id, team, rosters, list_move_instruction, rng)
+        rule_orders[creature_id] = list_move_instruction
+    candidates = [" ".join(order for creature_id in members for order in rule_orders[creature_id])]
+
+    attack = []
+    feed = []
+    for creature_id in members:
+        location = get_object_location(data, creature_id)
+        if get_creature_type(data, creature_id) != "human" and \
+                not AI_attack(data, data_map, creature_id, location, team, attack) and enemy_alpha_id is not None:
+            object1_to_object2(data, data_map, location, get_object_location(data, enemy_alpha_id), attack, "@", rng)
+        if not AI_eat(data, data_map, creature_id, location, feed, rng):
+            feed.extend(rule_orders[creature_id])
+    candidates += [" ".join(attack), " ".join(feed)]
+
+    for candidate in range(MCTS_NB_CANDIDATES - 3):
+        orders = []
+        for creature_id in members:
+            if rng.random() < 0.3:
+                location = get_object_location(data, creature_id)
+                d_row, d_col = rng.choice(get_neighbourhood(1))
+                target = [location[0] + d_row, location[1] + d_col]
+                symbol = "*" if get_werewolf_id_from_location(data, target) is not None else "@"
+                if (d_row, d_col) != (0, 0) and is_in_map(data, target):
+                    orders.append("%d-%d:%s%d-%d" % (location[0], location[1], symbol, target[0], target[1]))
+            else:
+                orders.extend(rule_orders[creature_id])
+        candidates.append(" ".join(orders))
+    return candidates
+
+
+# game engine
+def start_game(map_path, seed=None):
+    """This function creates the state of a new game from the given map
+    Parameters:
+    ----------
+    map_path: path of map file (str)
+    seed: seed of the random generator of the game, drawn from the random module if None (int, optional)
+
+    Return:
+    ------
+    game: state of the game with the data, the map, the round counters and the random generator (dict)
+
+    Notes:
+    ------
+    Two games started with the same map and the same seed are played exactly the same way by the AI.
+    """
+    data = load_map(map_path)
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    return {"data": data,
+            "data_map": create_empty_map(data["map"]),
+            "nb_round": 0,
+            "nb_round_without_fight": -1,
+            "game_over": False,
+            "winner": None,
+            "seed": seed,
+            "rng": random.Random(seed),
+            "phase_timings": {phase: 0.0 for phase in ORDER_PHASES}}
+
+
+def get_team_energy(data, team):
+    """This function returns the sum of the energies of all werewolves of the given team
+    Parameters:
+    ----------
+    data: dictionary with all information (dict)
+    team: the team of the werewolves (int)
+
+    Return:
+    ------
+    energy: the total energy of the team (int)
+    """
+    columns = data["werewolves"].columns
+    return sum(energy for energy, creature_team in zip(columns["energy"], columns["team"]) if creature_team == team)
+
+
+def begin_round(game):
+    """This function starts a new round: refreshes the state and checks if the game is over
+    Parameters:
+    ----------
+    game: state of the game (dict)
+
+    Notes:
+    ------
+    The winner is 1 or 2, or 0 when the game ends in an egality.
+    """
+    data = game["data"]
+    journal = data.get("journal")
+    if journal is not None:
+        for key in ("nb_round", "nb_round_without_fight", "game_over", "winner"):
+            journal_item(journal, game, key)
+    game["nb_round"] += 1
+    game["nb_round_without_fight"] += 1
+    refresh_creatures(data)
+
+    dead_alpha_teams = []
+    for creature_id in data["werewolves"]:
+        if get_creature_type(data, creature_id) == "alpha" and get_object_energy(data, creature_id) <= 0:
+            dead_alpha_teams.append(get_creature_team(data, creature_id))
+    if dead_alpha_teams != []:
+        game["game_over"] = True
+        if 1 in dead_alpha_teams and 2 in dead_alpha_teams:
+            game["winner"] = 0
+        elif 1 in dead_alpha_teams:
+            game["winner"] = 2
+        else:
+            game["winner"] = 1
+
+    columns = data["werewolves"].columns
+    if columns["energy"] != columns["previous_energy"]:
+        game["nb_round_without_fight"] = 0
+        if journal is not None:
+            journal.extend((columns["previous_energy"], i, previous) for i, (previous, energy)
+                           in enumerate(zip(columns["previous_energy"], columns["energy"])) if previous != energy)
+        columns["previous_energy"][:] = columns["energy"]
+
+    if game["nb_round_without_fight"] == 200 and not game["game_over"]:
+        energy_team1 = get_team_energy(data, 1)
+        energy_team2 = get_team_energy(data, 2)
+        game["game_over"] = True
+        if energy_team1 > energy_team2:
+            game["winner"] = 1
+        elif energy_team2 > energy_team1:
+            game["winner"] = 2
+        else:
+            game["winner"] = 0
+
+
+def get_player_orders(game, team, player_type, connection=None, mcts_workers=None):
+    """This function returns the orders of a player for the current round
+    Parameters:
+    ----------
+    game: state of the game (dict)
+    team: team of the player (int)
+    player_type: type of the player ('human', 'AI', 'MCTS' or 'remote') (str)
+    connection: sockets to receive orders from a remote player (dict of socket.socket, optional)
+    mcts_workers: number of processes of an 'MCTS' player, see get_MCTS_orders (int, optional)
+
+    Return:
+    ------
+    orders: the orders of the player, a list if a remote player sent them in binary (str or list of Order)
+    """
+    if player_type == "human":
+        return input("TEAM %d: Pls give the instruction " % team)
+    elif player_type == "AI":
+        return get_AI_orders(game["data"], game["data_map"], team, game["rng"])
+    elif player_type == "MCTS":
+        return get_MCTS_orders(game, team, nb_workers=mcts_workers)
+    elif player_type == "remote":
+        return get_remote_orders(connection)
+    raise ValueError("unknown player type %s" % player_type)
+
+
+def play_round(game, orders_team1, orders_team2):
+    """This function executes the orders of both teams for the current round
+    Parameters:
+    ----------
+    game: state of the game (dict)
+    orders_team1: orders of the first team, as a line or already parsed (str or list of Order)
+    orders_team2: orders of the second team, as a line or already parsed (str or list of Order)
+    """
+    data = game["data"]
+    if isinstance(orders_team1, str):
+        orders_team1 = parse_orders(orders_team1)
+    if isinstance(orders_team2, str):
+        orders_team2 = parse_orders(orders_team2)
+    list_valid_team1_instruction = check_if_good_team(data, orders_team1, 1)
+    list_valid_team2_instruction = check_if_good_team(data, orders_team2, 2)
+    get_instruction(data, game["data_map"], list_valid_team1_instruction + list_valid_team2_instruction,
+                    game["phase_timings"])
+
+
+def get_game_result(game):
+    """This function returns the result of a game
+    Parameters:
+    ----------
+    game: state of the game (dict)
+
+    Return:
+    ------
+    result: winner, number of rounds, final energy of each team, seed, time spent in each phase and, for
+            the 'MCTS' players, number of rollouts per second (dict)
+    """
+    data = game["data"]
+    result = {"winner": game["winner"],
+              "nb_round": game["nb_round"],
+              "seed": game["seed"],
+              "energies": {1: get_team_energy(data, 1), 2: get_team_energy(data, 2)},
+              "phase_timings": dict(game["phase_timings"])}
+    if "mcts_stats" in game:
+        result["rollouts_per_second"] = {team: stats["rollouts"] / stats["time"]
+                                         for team, stats in game["mcts_stats"].items()}
+    return result
+
+
+def dump_snapshot(game):
+    """This function returns a binary snapshot of the whole state of a game, see load_snapshot
+    Parameters:
+    ----------
+    game: state of the game (dict)
+
+    Return:
+    ------
+    snapshot: the snapshot (bytes)
+
+    Notes:
+    ------
+    A snapshot is a SNAPSHOT_HEADER, the state of the random generator of the game, then for the
+    werewolves and the foods: whether each object is alive, then each column of the table, then the bonus
+    grid (team, row, column and bonus columns) and the index of the werewolves in data["bonus_dirty"] and
+    data["fallen"].  Columns are stored as raw arrays (in the byte order given by the header) aligned on
+    8 bytes, so a snapshot can be read straight from a memory-mapped file.  The occupancy index is not
+    stored: load_snapshot builds it again.
+    """
+    data = game["data"]
+    werewolves, foods = data["werewolves"], data["foods"]
+    grid = data["bonus_grid"]
+    version, internal_state, gauss_next = game["rng"].getstate()
+    winner = -1 if game["winner"] is None else game["winner"]
+    seed = -1 if game["seed"] is None else game["seed"]
+    parts = [SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, sys.byteorder == "big", game["game_over"], version,
+                                  data["map"][0], data["map"][1], game["nb_round"], game["nb_round_without_fight"],
+                                  winner, seed, len(werewolves.ids), len(foods.ids), len(grid),
+                                  len(data["bonus_dirty"]), len(data["fallen"])),
+             SNAPSHOT_RNG.pack(gauss_next is not None, gauss_next or 0.0)]
+    columns = [array('I', internal_state)]
+    for table in (werewolves, foods):
+        columns += [table.alive] + [table.columns[name] for name, typecode in table.columns_spec]
+    columns += [array('b', [team for team, row, col in grid]), array('i', [row for team, row, col in grid]),
+                array('i', [col for team, row, col in grid]), array('i', grid.values())]
+    for creature_ids in (data["bonus_dirty"], data["fallen"]):
+        columns.append(array('i', [werewolves.index[creature_id] for creature_id in creature_ids]))
+    for column in columns:
+        block = column.tobytes()
+        parts.append(block)
+        parts.append(bytes(-len(block) % 8))
+    return b"".join(parts)
+
+
+def load_snapshot(snapshot):
+    """This function returns the state of a game from a binary snapshot, see dump_snapshot
+    Parameters:
+    ----------
+    snapshot: the snapshot (bytes-like object, e.g. bytes or mmap.mmap)
+
+    Return:
+    ------
+    game: state of the game, ready to go on from the round where the snapshot was taken (dict)
+
+    Raises:
+    ------
+    ValueError: if the snapshot is not valid (foreign, truncated or inconsistent data)
+    """
+    snapshot = memoryview(snapshot)
+    if len(snapshot) < len(SNAPSHOT_MAGIC) or bytes(snapshot[:len(SNAPSHOT_MAGIC)]) != SNAPSHOT_MAGIC:
+        raise ValueError("not a game snapshot")
+    if len(snapshot) < SNAPSHOT_HEADER.size + SNAPSHOT_RNG.size:
+        raise ValueError("truncated game snapshot")
+    (magic, big_endian, game_over, version, nb_rows, nb_cols, nb_round, nb_round_without_fight, winner, seed,
+     nb_werewolves, nb_foods, nb_bonuses, nb_dirty, nb_fallen) = SNAPSHOT_HEADER.unpack_from(snapshot)
+    if nb_rows < 1 or nb_cols < 1:
+        raise ValueError("invalid map size %dx%d in game snapshot" % (nb_rows, nb_cols))
+    swap = big_endian != (sys.byteorder == "big")
+    offset = SNAPSHOT_HEADER.size
+    has_gauss, gauss_next = SNAPSHOT_RNG.unpack_from(snapshot, offset)
+    offset += SNAPSHOT_RNG.size
+
+    def read_column(typecode, length):
+        nonlocal offset
+        column = array(typecode)
+        size = column.itemsize * length
+        if offset + size > len(snapshot):
+            raise ValueError("truncated game snapshot")
+        column.frombytes(snapshot[offset:offset + size])
+        if swap:
+            column.byteswap()
+        offset += size + (-size % 8)
+        return column
+
+    def check_range(column, start, end, name):
+        if len(column) > 0 and (min(column) < start or max(column) >= end):
+            raise ValueError("invalid %s in game snapshot" % name)
+        return column
+
+    internal_state = read_column('I', 625)
+    rng = random.Random()
+    try:
+        rng.setstate((version, tuple(internal_state), gauss_next if has_gauss else None))
+    except (TypeError, ValueError):
+        raise ValueError("invalid random generator state in game snapshot") from None
+
+    data = {"map": [nb_rows, nb_cols]}
+    for object_name, table, length in (("werewolves", WerewolfTable(), nb_werewolves),
+                                       ("foods", FoodTable(), nb_foods)):
+        table.alive = read_column('b', length)
+        table.nb_alive = table.alive.count(1)
+        for name, typecode in table.columns_spec:
+            table.columns[name] = read_column(typecode, length)
+            if name in table.codes:
+                check_range(table.columns[name], 0, len(table.codes[name]), "%s %s" % (object_name, name))
+        check_range(table.columns["row"], 1, nb_rows + 1, "%s location" % object_name)
+        check_range(table.columns["col"], 1, nb_cols + 1, "%s location" % object_name)
+        table.appenders = [(name, table.columns[name].append, codes) for name, append, codes in table.appenders]
+        table.ids = [table.prefix + str(i) for i in range(1, length + 1)]
+        table.index = dict(zip(table.ids, range(length)))
+        data[object_name] = table
+
+    build_occupancy(data)
+    grid_keys = zip(read_column('b', nb_bonuses), read_column('i', nb_bonuses), read_column('i', nb_bonuses))
+    data["bonus_grid"] = dict(zip(grid_keys, read_column('i', nb_bonuses)))
+    werewolf_ids = data["werewolves"].ids
+    for name, length in (("bonus_dirty", nb_dirty), ("fallen", nb_fallen)):
+        indexes = check_range(read_column('i', length), 0, nb_werewolves, "werewolf index")
+        data[name] = {werewolf_ids[i] for i in indexes}
+
+    return {"data": data,
+            "data_map": create_empty_map(data["map"]),
+            "nb_round": nb_round,
+            "nb_round_without_fight": nb_round_without_fight,
+            "game_over": bool(game_over),
+            "winner": None if winner == -1 else winner,
+            "seed": None if seed == -1 else seed,
+            "rng": rng,
+            "phase_timings": {phase: 0.0 for phase in ORDER_PHASES}}
+
+
+def save_snapshot(game, path):
+    """This function saves a binary snapshot of a game in a file, see dump_snapshot
+    Parameters:
+    ----------
+    game: state of the game (dict)
+    path: path of the snapshot file (str)
+    """
+    with open(path, "wb") as file:
+        file.write(dump_snapshot(game))
+
+
+def read_snapshot(path):
+    """This function returns the state of a game saved by save_snapshot
+    Parameters:
+    ----------
+    path: path of the snapshot file (str)
+
+    Return:
+    ------
+    game: state of the game (dict)
+
+    Notes:
+    ------
+    The file is memory-mapped: the columns are copied straight from the page cache into the tables.
+    """
+    with open(path, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as snapshot:
+            return load_snapshot(snapshot)
+
+
+def run_game(map_path, group_1, type_1, group_2, type_2, observers=(), seed=None, formats=None, mcts_workers=None):
+    """Runs a game to completion without any display.
+
+    Parameters
+    ----------
+    map_path: path of map file (str)
+    group_1: group of player 1 (int)
+    type_1: type of player 1 (str)
+    group_2: group of player 2 (int)
+    type_2: type of player 2 (str)
+    observers: functions called with the state of the game at each round (iterable, optional)
+    seed: seed of the random generator of the game (int, optional)
+    formats: formats of orders to negotiate with a remote player, None to send text (tuple of str, optional)
+    mcts_workers: number of processes of each 'MCTS' player, MCTS_WORKERS by default (int, optional)
+
+    Returns
+    -------
+    result: winner, number of rounds, final energy of each team, seed and time spent in each phase (dict)
+
+    Notes
+    -----
+    Nothing is printed and the game does not wait between rounds: use show_round and
+    pause_round as observers to get the terminal display back (see play_game).
+
+    """
+    game = start_game(map_path, seed)
+    connection = None
+    # create connection, if necessary
+    if type_1 == 'remote':
+        connection = create_connection(group_2, group_1, formats=formats)
+    elif type_2 == 'remote':
+        connection = create_connection(group_1, group_2, formats=formats)
+    # orders sent in binary are parsed once, before being sent and played
+    parse_local = connection is not None and connection.get('format') == 'binary'
+    # a group which did not negotiate the format took the negotiation for the first orders of the local team
+    negotiation_played = connection is not None and connection.pop('negotiation_played', False)
+
+    try:
+        while not game["game_over"]:
+            begin_round(game)
+            for observer in observers:
+                observer(game)
+
+            if not game["game_over"]:
+                orders_team1 = get_player_orders(game, 1, type_1, connection, mcts_workers)
+                if type_1 != 'remote' and type_2 == 'remote':
+                    if negotiation_played:
+                        orders_team1 = ''
+                        negotiation_played = False
+                    else:
+                        if parse_local:
+                            orders_team1 = parse_orders(orders_team1)
+                        notify_remote_orders(connection, orders_team1)
+                orders_team2 = get_player_orders(game, 2, type_2, connection, mcts_workers)
+                if type_2 != 'remote' and type_1 == 'remote':
+                    if negotiation_played:
+                        orders_team2 = ''
+                        negotiation_played = False
+                    else:
+                        if parse_local:
+                            orders_team2 = parse_orders(orders_team2)
+                        notify_remote_orders(connection, orders_team2)
+                play_round(game, orders_team1, orders_team2)
+    finally:
+        # the worker processes of the 'MCTS' players stop with the game, even if it stopped on an error
+        if "mcts_executor" in game:
+            game.pop("mcts_executor").shutdown()
+    return get_game_result(game)
+
+
+def show_round(game):
+    """Observer which shows the map and the round counters in the terminal
+    Parameters:
+    ----------
+    game: state of the game (dict)
+
+    Notes:
+    ------
+    Only the cells which changed since the last round are redrawn (see draw_frame).
+    """
+    if "renderer" not in game:
+        game["renderer"] = create_renderer()
+    draw_frame(game["data"], game["renderer"],
+               ["", "Round : %d" % game["nb_round"], "", "Round without fight : %d" % game["nb_round_without_fight"]],
+               force=game["game_over"])
+
+
+def pause_round(game):
+    """Observer which waits between two rounds so that the game can be followed
+    Parameters:
+    ----------
+    game: state of the game (dict)
+    """
+    time.sleep(0.2)
+
+
 # main function
-def play_game(map_path, group_1, type_1, group_2, type_2):
+def play_game(map_path, group_1, type_1, group_2, type_2, seed=None):
     """Play a game.
 
     Parameters
@@ -1530,100 +3894,28 @@ def play_game(map_path, group_1, type_1, group_2, type_2):
     type_1: type of player 1 (str)
     group_2: group of player 2 (int)
     type_2: type of player 2 (str)
+    seed: seed of the random generator of the game, to replay a game (int, optional)
 
     Notes
     -----
-    Player type is either 'human', 'AI' or 'remote'.
+    Player type is either 'human', 'AI', 'MCTS' or 'remote'.
 
     If there is an external referee, set group id to 0 for remote player.
 
     """
-    data = extract_ano_file(map_path)
-    data_map = create_empty_map(data["map"])
-    game_over = False
-    nb_round = 0
-    nb_round_without_fight = -1
-    # create connection, if necessary
-    if type_1 == 'remote':
-        connection = create_connection(group_2, group_1)
-    elif type_2 == 'remote':
-        connection = create_connection(group_1, group_2)
-
-    while game_over == False:
-        nb_round += 1
-        nb_round_without_fight += 1
-        print(term.home + term.clear)
-        show_map(data, data_map)
-        print("\nRound :", nb_round)
-        print("\nRound without fight :", nb_round_without_fight)
-
-        for creature_id in data["werewolves"]:
-            if get_creature_team(data, creature_id) == 1 and get_creature_type(data,
-                                                                               creature_id) == "alpha" and get_object_energy(
-                data, creature_id) <= 0:
-                game_over = True
-                print("team 1 loose")
-            elif get_creature_team(data, creature_id) == 2 and get_creature_type(data,
-                                                                                 creature_id) == "alpha" and get_object_energy(
-                data, creature_id) <= 0:
-                game_over = True
-                print("team 2 loose")
-
-        for creature_id in data["werewolves"]:
-            if get_object_energy(data, creature_id) != get_creature_previous_energy(data, creature_id):
-                nb_round_without_fight = 0
-                data["werewolves"][creature_id]["previous_energy"] = get_object_energy(data, creature_id)
-
-        if nb_round_without_fight == 200:
-            energy_team1 = 0
-            energy_team2 = 0
-            for creature_id in data["werewolves"]:
-                if get_creature_team(data, creature_id) == 1:
-                    energy_team1 += get_object_energy(data, creature_id)
-                else:
-                    energy_team2 += get_object_energy(data, creature_id)
-            if energy_team1 > energy_team2:
-                print("Team 1 win")
-                game_over = True
-            elif energy_team1 > energy_team2:
-                print("Team 2 win")
-                game_over = True
-            else:
-                print("Egality")
-                game_over = True
-
-        if game_over != True:
-
-            if type_1 == "human":
-                instruction_team_1 = input("TEAM 1: Pls give the instruction ")
-                list_valid_team1_instruction = check_if_good_team(data, instruction_team_1, 1)
-                if type_2 == 'remote':
-                    notify_remote_orders(connection, instruction_team_1)
-            elif type_1 == "AI":
-                instruction_team_1 = get_AI_orders(data, data_map, 1)
-                list_valid_team1_instruction = check_if_good_team(data, instruction_team_1, 1)
-                if type_2 == 'remote':
-                    notify_remote_orders(connection, instruction_team_1)
-            elif type_1 == 'remote':
-                instruction_team_1 = get_remote_orders(connection)
-                list_valid_team1_instruction = check_if_good_team(data, instruction_team_1, 1)
-
-            if type_2 == "human":
-                instruction_team_2 = input("TEAM 2: Pls give the instruction ")
-                list_valid_team2_instruction = check_if_good_team(data, instruction_team_2, 2)
-                if type_1 == 'remote':
-                    notify_remote_orders(connection, instruction_team_2)
-            elif type_2 == "AI":
-                instruction_team_2 = get_AI_orders(data, data_map, 2)
-                list_valid_team2_instruction = check_if_good_team(data, instruction_team_2, 2)
-                if type_1 == 'remote':
-                    notify_remote_orders(connection, instruction_team_2)
-            elif type_2 == 'remote':
-                instruction_team_2 = get_remote_orders(connection)
-                list_valid_team2_instruction = check_if_good_team(data, instruction_team_2, 1)
-            get_instruction(data, data_map, list_valid_team1_instruction + list_valid_team2_instruction)
-        time.sleep(0.2)
-
-
-play_game('file.ano', 36, 'AI', 27, 'AI')
+    result = run_game(map_path, group_1, type_1, group_2, type_2, observers=(show_round, pause_round),
+                      seed=seed)
+    if result["winner"] == 1:
+        print("Team 1 win")
+    elif result["winner"] == 2:
+        print("Team 2 win")
+    else:
+        print("Egality")
+    return result
+
+
+for radius in (1, 2, 4, 6):
+    get_neighbourhood(radius)
 
+if __name__ == '__main__':
+    play_game('file.ano', 36, 'AI', 27, 'AI')
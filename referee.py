@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Referee hosting many matches at the same time.
+
+Usage: python referee.py map_path group_1-group_2 [group_1-group_2 ...]
+
+Each group connects to the referee as usual (create_connection(your_group) on port 42000 + group id),
+the referee relays the orders of each match between its two groups and plays the match on the
+headless engine to know its winner.
+"""
+
+import asyncio
+import sys
+import time
+
+import main
+
+
+def get_round_stats(latencies, duration):
+    """Returns the latency and throughput of the rounds of a match
+    Parameters:
+    ----------
+    latencies: time between the beginning and the end of each round, in seconds (list of float)
+    duration: time of the whole match, in seconds (float)
+
+    Return:
+    ------
+    stats: mean, median and maximum latency in milliseconds and number of rounds per second (dict)
+    """
+    if latencies == []:
+        return {"mean_latency": 0.0, "median_latency": 0.0, "max_latency": 0.0, "rounds_per_second": 0.0}
+    ordered = sorted(latencies)
+    return {"mean_latency": 1000 * sum(ordered) / len(ordered),
+            "median_latency": 1000 * ordered[len(ordered) // 2],
+            "max_latency": 1000 * ordered[-1],
+            "rounds_per_second": len(ordered) / duration if duration > 0 else 0.0}
+
+
+async def referee_match(map_path, group_1, group_2, connect_timeout=None, round_timeout=None, verbose=False):
+    """Waits for the two groups of a match, relays their orders and plays the match
+    Parameters:
+    ----------
+    map_path: path of map file (str)
+    group_1: id of the first group (int)
+    group_2: id of the second group (int)
+    connect_timeout: maximum time to wait for the groups in seconds (float, optional)
+    round_timeout: maximum time to wait for the orders of a round in seconds (float, optional)
+    verbose: True to print the result of the match (bool, optional)
+
+    Return:
+    ------
+    result: the groups, the result of the game (see main.get_game_result), the error which stopped the match
+            (None if it was played to the end) and the round statistics (see get_round_stats) (dict)
+    """
+    result = {"groups": (group_1, group_2), "error": None}
+    try:
+        connections = await main.bind_referee_async(group_1, group_2, connect_timeout)
+    except IOError as error:
+        result["error"] = str(error)
+        result.update(get_round_stats([], 0))
+        return result
+
+    game = main.start_game(map_path)
+    latencies = []
+    start = time.perf_counter()
+    try:
+        while not game["game_over"]:
+            main.begin_round(game)
+            if not game["game_over"]:
+                round_start = time.perf_counter()
+                orders_team1, orders_team2 = await main.relay_round_async(connections, round_timeout)
+                main.play_round(game, orders_team1, orders_team2)
+                latencies.append(time.perf_counter() - round_start)
+    except IOError as error:
+        result["error"] = str(error)
+    finally:
+        for connection in connections.values():
+            await main.close_connection_async(connection)
+
+    result.update(main.get_game_result(game))
+    if result["error"] is not None:
+        result["winner"] = None
+    result.update(get_round_stats(latencies, time.perf_counter() - start))
+    if verbose:
+        show_match(result)
+    return result
+
+
+async def run_referee(map_path, pairings, connect_timeout=None, round_timeout=None, verbose=False):
+    """Referees all the given matches at the same time
+    Parameters:
+    ----------
+    map_path: path of map file (str)
+    pairings: ids of the two groups of each match (list of tuple)
+    connect_timeout: maximum time to wait for the groups in seconds (float, optional)
+    round_timeout: maximum time to wait for the orders of a round in seconds (float, optional)
+    verbose: True to print the result of each match when it ends (bool, optional)
+
+    Return:
+    ------
+    results: the result of each match, see referee_match (list of dict)
+    """
+    groups = [group for pairing in pairings for group in pairing]
+    if len(set(groups)) != len(groups):
+        raise ValueError("a group cannot play several matches at the same time")
+    return await asyncio.gather(*(referee_match(map_path, group_1, group_2, connect_timeout, round_timeout, verbose)
+                                  for group_1, group_2 in pairings))
+
+
+def show_match(result):
+    """Prints the result and the round statistics of a match
+    Parameters:
+    ----------
+    result: the result of the match, see referee_match (dict)
+    """
+    if result["error"] is not None:
+        outcome = "stopped (%s)" % result["error"]
+    elif result["winner"] == 0:
+        outcome = "egality"
+    else:
+        outcome = "group %d win" % result["groups"][result["winner"] - 1]
+    print("%d vs %d: %s after %d rounds, latency %.2f ms (median %.2f, max %.2f), %.0f rounds/s" % (
+        result["groups"][0], result["groups"][1], outcome, result.get("nb_round", 0), result["mean_latency"],
+        result["median_latency"], result["max_latency"], result["rounds_per_second"]))
+
+
+if __name__ == '__main__':
+    pairings = [tuple(int(group) for group in pairing.split("-")) for pairing in sys.argv[2:]]
+    start = time.perf_counter()
+    results = asyncio.run(run_referee(sys.argv[1], pairings, round_timeout=10, verbose=True))
+    duration = time.perf_counter() - start
+    nb_rounds = sum(result.get("nb_round", 0) for result in results)
+    print("%d matches, %d rounds in %.3f s (%.0f rounds/s)" % (len(results), nb_rounds, duration, nb_rounds / duration))
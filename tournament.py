@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Tournament of headless games played in parallel on all the cores.
+
+Usage: python tournament.py [nb_matches] [map_path ...]
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import main
+
+
+def get_matches(map_paths, pairings, nb_matches, seed=0):
+    """Returns the list of the matches of a tournament
+    Parameters:
+    ----------
+    map_paths: paths of the map files (list of str)
+    pairings: types of player 1 and player 2 of each pairing (list of tuple)
+    nb_matches: number of matches of each pairing on each map (int)
+    seed: seed of the first match (int, optional)
+
+    Return:
+    ------
+    matches: map path, type of player 1, type of player 2 and seed of each match (list of tuple)
+
+    Notes:
+    ------
+    Every match has its own seed so that a match gives the same result whatever the worker playing it.
+    """
+    matches = []
+    for map_path in map_paths:
+        for type_1, type_2 in pairings:
+            for match in range(nb_matches):
+                matches.append((map_path, type_1, type_2, seed + len(matches)))
+    return matches
+
+
+def play_match(match):
+    """Plays a match of the tournament without any display
+    Parameters:
+    ----------
+    match: map path, type of player 1, type of player 2 and seed of the match (tuple)
+
+    Return:
+    ------
+    result: the match and the result of the game, see main.get_game_result (tuple)
+    """
+    map_path, type_1, type_2, seed = match
+    # the matches already use all the cores: 'MCTS' players search in the process of their match
+    return match, main.run_game(map_path, 1, type_1, 2, type_2, seed=seed, mcts_workers=1)
+
+
+def aggregate_results(results):
+    """Sums up the results of the matches of each map and pairing
+    Parameters:
+    ----------
+    results: the matches and their results, see play_match (iterable)
+
+    Return:
+    ------
+    stats: number of matches, wins, win rates and rounds for each (map path, type 1, type 2) (dict)
+    """
+    stats = {}
+    for (map_path, type_1, type_2, seed), result in results:
+        key = (map_path, type_1, type_2)
+        if key not in stats:
+            stats[key] = {"nb_match": 0, "wins": {0: 0, 1: 0, 2: 0}, "nb_round": 0,
+                          "min_round": result["nb_round"], "max_round": result["nb_round"]}
+        stat = stats[key]
+        stat["nb_match"] += 1
+        stat["wins"][result["winner"]] += 1
+        stat["nb_round"] += result["nb_round"]
+        stat["min_round"] = min(stat["min_round"], result["nb_round"])
+        stat["max_round"] = max(stat["max_round"], result["nb_round"])
+
+    for stat in stats.values():
+        stat["win_rates"] = {winner: wins / stat["nb_match"] for winner, wins in stat["wins"].items()}
+        stat["mean_round"] = stat["nb_round"] / stat["nb_match"]
+    return stats
+
+
+def run_tournament(map_paths, pairings, nb_matches, seed=0, max_workers=None):
+    """Plays all the matches of a tournament in parallel and sums up their results
+    Parameters:
+    ----------
+    map_paths: paths of the map files (list of str)
+    pairings: types of player 1 and player 2 of each pairing (list of tuple)
+    nb_matches: number of matches of each pairing on each map (int)
+    seed: seed of the first match (int, optional)
+    max_workers: number of worker processes, all the cores by default (int, optional)
+
+    Return:
+    ------
+    stats: the results of each map and pairing, see aggregate_results (dict)
+
+    Notes:
+    ------
+    The players must be able to play without a terminal: 'human' and 'remote' players are refused.
+    Matches are sent to the workers by chunks so that the processes spend their time playing.
+    """
+    for type_1, type_2 in pairings:
+        for player_type in (type_1, type_2):
+            if player_type in ("human", "remote"):
+                raise ValueError("a tournament cannot be played by a %s player" % player_type)
+
+    matches = get_matches(map_paths, pairings, nb_matches, seed)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_workers == 1:
+        return aggregate_results(map(play_match, matches))
+
+    chunksize = max(1, len(matches) // (max_workers * 4))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return aggregate_results(executor.map(play_match, matches, chunksize=chunksize))
+
+
+def show_stats(stats):
+    """Prints the results of a tournament, one line per map and pairing
+    Parameters:
+    ----------
+    stats: the results of each map and pairing, see aggregate_results (dict)
+    """
+    for (map_path, type_1, type_2), stat in stats.items():
+        print("%s %s vs %s: %d matches, team 1 %.0f%%, team 2 %.0f%%, egality %.0f%%, rounds %.1f (%d-%d)" % (
+            map_path, type_1, type_2, stat["nb_match"], 100 * stat["win_rates"][1], 100 * stat["win_rates"][2],
+            100 * stat["win_rates"][0], stat["mean_round"], stat["min_round"], stat["max_round"]))
+
+
+if __name__ == '__main__':
+    nb_matches = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    map_paths = sys.argv[2:] or ['file.ano']
+    max_workers = os.cpu_count() or 1
+    start = time.perf_counter()
+    stats = run_tournament(map_paths, [('AI', 'AI')], nb_matches, max_workers=max_workers)
+    duration = time.perf_counter() - start
+    show_stats(stats)
+    print("%d matches in %.3f s on %d workers" % (len(map_paths) * nb_matches, duration, max_workers))